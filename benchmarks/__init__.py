@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the mediapanel package. These are not shipped with
+the package; run them from a checkout, e.g. python -m benchmarks.codec
+"""
@@ -0,0 +1,216 @@
+"""
+Run the benchmark suite against a generated synthetic fleet and write the
+results as JSON, optionally comparing them with an earlier run.
+
+    python -m benchmarks [--clients 2] [--devices 50] [--output out.json]
+                         [--compare baseline.json] [--threshold 1.25]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from os.path import dirname, join
+from statistics import mean
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict
+
+from mediapanel.applets import SQLiteBackend, StorageCache, StorageManager
+from mediapanel.config import (AdsConfig, AdsHorizontalConfig,
+                               AdsVerticalConfig, EventsConfig, GeneralConfig,
+                               LayoutConfig)
+from mediapanel.config.section import CONFIG_CACHE
+
+from .fleet import generate_database, generate_tree
+
+# file written by generate_tree for each section, relative to the device
+SOURCES = {
+    GeneralConfig: GeneralConfig.file_path,
+    LayoutConfig: LayoutConfig.file_path,
+    EventsConfig: EventsConfig.file_path,
+    AdsConfig: AdsConfig.file_path[0],
+    AdsVerticalConfig: AdsVerticalConfig.file_path[1],
+    AdsHorizontalConfig: AdsHorizontalConfig.file_path[1],
+}
+
+
+def measure(func: Callable[[], None], runs: int, ops: int = 1) -> dict:
+    """
+    Time runs calls of func, each performing ops operations.
+    """
+    func()  # warm up
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        func()
+        times.append((perf_counter() - start) / ops)
+    return {"mean_s": mean(times), "min_s": min(times), "runs": runs,
+            "ops": ops}
+
+
+def config_cases(base_path: str, pairs: list, runs: int) -> Dict[str, dict]:
+    results = {}
+    client_id, device_id = pairs[0]
+    device = join(base_path, str(client_id), "1", device_id)
+    for section, source in SOURCES.items():
+        path = join(device, source)
+        name = section.__name__
+        results[f"{name}.from_v6_file"] = measure(
+            lambda: section.from_v6_file(path, cached=False), runs)
+        results[f"{name}.from_v6_file cached"] = measure(
+            lambda: section.from_v6_file(path, cached=True), runs)
+        config = section.from_v6_file(path, cached=False)
+        results[f"{name}.to_v6_values"] = measure(config.to_v6_values, runs)
+        results[f"{name}.save_v6 forced"] = measure(
+            lambda: config.save_v6(force=True), runs)
+        results[f"{name}.save_v6 unchanged"] = measure(config.save_v6, runs)
+    return results
+
+
+def storage_cases(directory: str, runs: int, ops: int = 100) \
+        -> Dict[str, dict]:
+    state = {"temperature": 71.5, "conditions": "cloudy",
+             "forecast": [{"day": d, "high": 80, "low": 60}
+                          for d in range(7)]}
+    managers = {
+        "file": StorageManager("weather", "state", 1,
+                               join(directory, "applets")),
+        "sqlite": StorageManager("weather", "state", 1,
+                                 backend=SQLiteBackend(
+                                     join(directory, "applets.db"))),
+        "file cached": StorageManager("weather", "state", 1,
+                                      join(directory, "applets"),
+                                      cache=StorageCache()),
+    }
+    results = {}
+    for name, manager in managers.items():
+        def save(manager=manager):
+            for _ in range(ops):
+                manager.save(state)
+
+        def load(manager=manager):
+            for _ in range(ops):
+                manager.load()
+
+        results[f"StorageManager.save {name}"] = measure(save, runs, ops)
+        results[f"StorageManager.load {name}"] = measure(load, runs, ops)
+        manager.flush()
+    return results
+
+
+def sql_cases(url: str, pairs: list, runs: int) -> Dict[str, dict]:
+    # pylint: disable=import-outside-toplevel
+    from mediapanel.db import SessionFactory
+    from mediapanel.device import Device
+
+    factory = SessionFactory(url)
+    devices = [Device(client_id, device_id) for client_id, device_id in pairs]
+    results = {}
+
+    def single():
+        with factory.session_scope() as session:
+            for device in devices:
+                device.sql(session)
+
+    def many():
+        with factory.session_scope() as session:
+            Device.sql_many(session, devices)
+
+    def traverse_lazy():
+        with factory.session_scope() as session:
+            for row in Device.sql_many(session, devices).values():
+                _ = row.groups, row.assets
+
+    def traverse_eager():
+        with factory.session_scope() as session:
+            rows = Device.sql_many(session, devices,
+                                   eager=["groups", "assets"])
+            for row in rows.values():
+                _ = row.groups, row.assets
+
+    results["Device.sql"] = measure(single, runs, len(devices))
+    results["Device.sql_many"] = measure(many, runs, len(devices))
+    results["relationships lazy"] = measure(traverse_lazy, runs,
+                                            len(devices))
+    results["relationships eager"] = measure(traverse_eager, runs,
+                                             len(devices))
+    factory.dispose()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Print the ratio of each case's min time to the baseline's, returning
+    False if any case got slower than threshold.
+    """
+    ok = True
+    for case, result in sorted(results["results"].items()):
+        old = baseline["results"].get(case)
+        if old is None:
+            continue
+        ratio = result["min_s"] / old["min_s"] if old["min_s"] else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{case:<44}{ratio:>8.2f}x{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--people", type=int, default=1000)
+    parser.add_argument("--ads", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                cwd=dirname(dirname(__file__)),
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    with TemporaryDirectory() as directory:
+        base_path = join(directory, "device_config")
+        pairs = generate_tree(base_path, args.clients, args.devices,
+                              args.people, args.ads)
+        url = f"sqlite:///{join(directory, 'fleet.db')}"
+        generate_database(url, pairs)
+
+        CONFIG_CACHE.clear()
+        results = {}
+        results.update(config_cases(base_path, pairs, args.runs))
+        results.update(storage_cases(directory, args.runs))
+        results.update(sql_cases(url, pairs, args.runs))
+
+    report = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "params": {"clients": args.clients, "devices": args.devices,
+                   "people": args.people, "ads": args.ads,
+                   "runs": args.runs},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(report, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
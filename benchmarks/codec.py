@@ -0,0 +1,62 @@
+"""
+Compare the installed JSON codecs on real-sized config trees: decoding v6
+files, encoding them back to v6, and encoding applet state.
+
+    python -m benchmarks.codec [--people 5000] [--ads 300] [--repeat 20]
+"""
+import argparse
+import json
+from timeit import repeat
+
+from mediapanel import codec
+from mediapanel.config import EventsConfig
+from mediapanel.config.section import JSON_ENCODER
+
+from .fleet import ads_document, events_document
+
+
+def best(func, number: int, repeats: int) -> float:
+    return min(repeat(func, number=number, repeat=repeats)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--people", type=int, default=5000)
+    parser.add_argument("--ads", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    events = EventsConfig(EventsConfig.from_v6_values(
+        events_document(args.people)))
+    documents = {
+        "events": json.dumps(events_document(args.people)).encode(),
+        "ads": json.dumps(ads_document(args.ads)).encode(),
+    }
+    print(f"{'case':<28}{'codec':<10}{'ms':>10}")
+
+    for name, data in documents.items():
+        for backend in codec.AVAILABLE:
+            codec.use(backend)
+            seconds = best(lambda: codec.loads(data), 5, args.repeat)
+            print(f"{'decode ' + name:<28}{backend:<10}"
+                  f"{seconds * 1000:>10.3f}")
+
+    legacy = "".join(JSON_ENCODER.iterencode(events)).encode()
+    assert codec.dumps_v6(events) == legacy, "v6 output differs"
+    seconds = best(lambda: "".join(JSON_ENCODER.iterencode(events)),
+                   5, args.repeat)
+    print(f"{'encode v6 events (legacy)':<28}{'json':<10}"
+          f"{seconds * 1000:>10.3f}")
+    seconds = best(lambda: codec.dumps_v6(events), 5, args.repeat)
+    print(f"{'encode v6 events':<28}{'json':<10}{seconds * 1000:>10.3f}")
+
+    state = json.loads(documents["ads"])
+    for backend in codec.AVAILABLE:
+        codec.use(backend)
+        seconds = best(lambda: codec.dumps(state), 5, args.repeat)
+        print(f"{'encode applet state':<28}{backend:<10}"
+              f"{seconds * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Synthetic fleet generator: a device_config tree of N clients x M devices with
+general, layout, events and ads files of configurable size, and a populated
+database for the mediapanel.db models.
+
+    python -m benchmarks.fleet DIRECTORY [--clients 10] [--devices 100] ...
+"""
+import argparse
+import json
+import random
+from os import makedirs
+from os.path import dirname, join
+from typing import List, Tuple
+
+from mediapanel.config import (AdsConfig, AdsHorizontalConfig,
+                               AdsVerticalConfig, EventsConfig, GeneralConfig,
+                               LayoutConfig)
+
+APPS = ["weather", "news", "displayAD", "digitalFrame", "events", "alerts",
+        "jukebox", "clock"]
+
+
+def events_document(people: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    categories = ["Birthday", "Anniversary", "Hire Date", "Graduation"]
+    return {
+        "EVENTS": [{"NAME": name, "STATUS": "on"} for name in categories],
+        "PEOPLE": [{
+            "NAME": f"Person {i}",
+            "EVENTS": {name: [f"{rng.randint(1, 12):02d}/"
+                              f"{rng.randint(1, 28):02d}/"
+                              f"{rng.randint(1950, 2025)}"]
+                       for name in rng.sample(categories, 2)},
+        } for i in range(people)],
+    }
+
+
+def ads_document(ads: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    days = ["SUNDAY", "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY",
+            "FRIDAY", "SATURDAY"]
+
+    def runtime():
+        start = rng.randint(0, 20)
+        return {"OPEN": {"HOUR": f"{start:02d}", "MIN": "00"},
+                "CLOSE": {"HOUR": f"{start + rng.randint(1, 3):02d}",
+                          "MIN": "30"}}
+
+    return {"ADS": [{
+        "STARTDATE": "01/01/2026",
+        "ENDDATE": "12/31/2026",
+        "SCHEDULE": {day: [runtime() for _ in range(rng.randint(0, 3))]
+                     for day in days},
+        "RUNTIMEAUTO": rng.random() < 0.5,
+        "RUNTIMEINTERVAL": rng.choice([10, 15, 30]),
+        "BACKGROUND": f"backgrounds/{i}.jpg",
+        "BACKGROUNDSOUND": False,
+        "MEDIA": [f"media/{i}-{j}.mp4" for j in range(3)],
+        "MEDIASOUND": [False, True, False],
+        "LINES": [f"Line {j} of ad {i}" for j in range(3)],
+        "TITLE": f"Ad {i}",
+        "IDENT": f"ad-{i:05d}",
+        "NAME": f"Ad number {i}",
+    } for i in range(ads)]}
+
+
+def general_document(client_id: int, device_id: str, rng: random.Random) \
+        -> dict:
+    return {
+        "DEVICENICKNAME": f"Screen {device_id}",
+        "LOGOINTERVAL": rng.choice([0, 5, 10]),
+        "TIMEZONE": rng.choice(["America/New_York", "America/Chicago",
+                                "America/Denver", "America/Los_Angeles"]),
+        "ADDRESS": f"{rng.randint(1, 9999)} Main St",
+        "CITY": "Springfield",
+        "STATE": "IL",
+        "ZIPCODE": f"{rng.randint(10000, 99999)}",
+        "COUNTRY": "US",
+        "FILTERCONTENT": rng.random() < 0.5,
+        "WEATHER_ALERTS": rng.random() < 0.5,
+        "WOEID": "",
+        "WIFINAME": "",
+        "MODERATED": False,
+        "USEWIFI": False,
+    }
+
+
+def layout_document(rng: random.Random) -> dict:
+    vertical = rng.random() < 0.3
+    width, height = (1080, 1920) if vertical else (1920, 1080)
+    zone_count = rng.randint(1, 4)
+    zones = []
+    for i in range(zone_count):
+        x1 = width * i // zone_count
+        x2 = width * (i + 1) // zone_count
+        zones.append({"AREA": {"X1": x1, "Y1": 0, "X2": x2, "Y2": height},
+                      "APPS": rng.sample(APPS, rng.randint(1, 3))})
+    return {
+        "SETTINGS": {"VERTICAL": vertical, "LAYOUT": zone_count,
+                     "SCROLLER": rng.random() < 0.5,
+                     "MINIZONE": rng.random() < 0.5},
+        "ZONES": zones,
+    }
+
+
+def _write(path: str, document: dict):
+    makedirs(dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f)
+
+
+def generate_tree(base_path: str, clients: int = 10, devices: int = 100,
+                  people: int = 500, ads: int = 50, seed: int = 0) \
+        -> List[Tuple[int, str]]:
+    """
+    Write a device_config tree under base_path in the layout expected by
+    Config.from_v6_id. Every device gets all six config files; AdsConfig is
+    written to its _adv path and the vertical and horizontal variants to
+    their fallback paths. Returns the (client_id, device_id) pairs.
+    """
+    rng = random.Random(seed)
+    pairs = []
+    for client_id in range(1, clients + 1):
+        # events and ads are usually shared by a client's devices
+        events = events_document(people, seed + client_id)
+        ad_list = ads_document(ads, seed + client_id)
+        for n in range(devices):
+            device_id = f"{client_id:04d}-{n:05d}"
+            device = join(base_path, str(client_id), "1", device_id)
+            _write(join(device, GeneralConfig.file_path),
+                   general_document(client_id, device_id, rng))
+            _write(join(device, LayoutConfig.file_path),
+                   layout_document(rng))
+            _write(join(device, EventsConfig.file_path), events)
+            _write(join(device, AdsConfig.file_path[0]), ad_list)
+            _write(join(device, AdsVerticalConfig.file_path[1]), ad_list)
+            _write(join(device, AdsHorizontalConfig.file_path[1]), ad_list)
+            pairs.append((client_id, device_id))
+    return pairs
+
+
+def generate_database(url: str, pairs: List[Tuple[int, str]],
+                      groups_per_client: int = 5, assets_per_device: int = 5,
+                      seed: int = 0):
+    """
+    Create the mediapanel.db schema at url and fill it with clients,
+    devices, groups and assets for the given (client_id, device_id) pairs.
+    """
+    # pylint: disable=import-outside-toplevel
+    from datetime import datetime, timedelta
+    from mediapanel.db import (Asset, Base, Client, Device, Group,
+                               SessionFactory)
+
+    rng = random.Random(seed)
+    factory = SessionFactory(url)
+    Base.metadata.create_all(factory.engine)
+    now = datetime.now()
+    asset_id = 0
+    with factory.session_scope() as session:
+        groups = {}
+        for client_id in sorted({client for client, _ in pairs}):
+            session.add(Client(client_id=client_id,
+                               client_name=f"Client {client_id}",
+                               email=f"client{client_id}@example.com"))
+            groups[client_id] = [
+                Group(group_id=client_id * 1000 + g, client_id=client_id,
+                      group_name=f"Group {g}")
+                for g in range(groups_per_client)]
+            session.add_all(groups[client_id])
+        for client_id, device_id in pairs:
+            device = Device(
+                device_id=device_id, client_id=client_id, uname="Linux",
+                nickname=f"Screen {device_id}",
+                last_ping=now - timedelta(minutes=rng.expovariate(1 / 600)),
+                total_disk=32 * 1024 ** 3,
+                free_disk=rng.randint(1, 30) * 1024 ** 3)
+            session.add(device)
+            for group in rng.sample(groups[client_id],
+                                    min(2, groups_per_client)):
+                group.devices.append(device)
+            for _ in range(assets_per_device):
+                asset_id += 1
+                session.add(Asset(
+                    id=asset_id, client_id=client_id, device_id=device_id,
+                    group_id=groups[client_id][0].group_id,
+                    filename=f"asset{asset_id}.jpg",
+                    is_digital_frame=rng.random() < 0.5,
+                    is_display_ad=rng.random() < 0.5,
+                    is_alerts=False, is_jukebox=False, filetype="image",
+                    thumbnail_name=f"thumb{asset_id}.jpg",
+                    size=rng.random() * 10))
+    factory.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--people", type=int, default=500)
+    parser.add_argument("--ads", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", default=None,
+                        help="SQLAlchemy URL to populate as well")
+    args = parser.parse_args()
+    pairs = generate_tree(args.directory, args.clients, args.devices,
+                          args.people, args.ads, args.seed)
+    if args.database:
+        generate_database(args.database, pairs, seed=args.seed)
+    print(f"generated {len(pairs)} devices")
+
+
+if __name__ == "__main__":
+    main()
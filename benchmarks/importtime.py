@@ -0,0 +1,86 @@
+"""
+Import-time regression check, based on python -X importtime. Each target is
+imported in a fresh interpreter several times and the best cumulative time is
+compared against the budget in importtime.json; modules a target must not
+pull in (such as SQLAlchemy for config-only consumers) are checked as well.
+Exits non-zero if any target is over budget.
+
+Absolute times depend on the machine, so budgets are ratios to the import
+time of a reference standard library module, measured in the same run and
+interleaved with the targets.
+
+    python -m benchmarks.importtime [--runs 5] [--update]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from os.path import dirname, join
+
+BUDGETS = join(dirname(__file__), "importtime.json")
+ROOT = dirname(dirname(__file__))
+
+
+def import_times(target: str) -> dict:
+    """
+    Cumulative import time in microseconds of every module imported by
+    "import target" in a fresh interpreter.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update", action="store_true",
+                        help="rewrite the budgets as 1.5x the measured "
+                             "ratios")
+    args = parser.parse_args()
+
+    with open(BUDGETS) as f:
+        budgets = json.load(f)
+    reference = budgets["reference"]
+    targets = budgets["targets"]
+
+    runs = {name: [] for name in [reference] + list(targets)}
+    for _ in range(args.runs):
+        for name, times in runs.items():
+            times.append(import_times(name))
+    reference_us = min(run[reference] for run in runs[reference])
+
+    failed = False
+    results = {"reference": {"module": reference, "best_us": reference_us}}
+    for target, budget in targets.items():
+        best = min(run[target] for run in runs[target])
+        ratio = best / reference_us
+        forbidden = sorted({name for run in runs[target] for name in run
+                            if name.split(".")[0] in budget["forbidden"]})
+        over = ratio > budget["max_ratio"]
+        failed |= over or bool(forbidden)
+        results[target] = {"best_us": best, "ratio": round(ratio, 3),
+                           "max_ratio": budget["max_ratio"],
+                           "over_budget": over,
+                           "forbidden_imports": forbidden}
+        if args.update:
+            budget["max_ratio"] = round(ratio * 1.5, 2)
+
+    print(json.dumps(results, indent=2))
+    if args.update:
+        with open(BUDGETS, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
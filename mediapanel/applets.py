@@ -1,9 +1,724 @@
 """
 Applet utility functions and classes
+
+Applets import this module on every request, so anything not needed to load
+and save state (typing, threading beyond plain locks, fcntl, sqlite3, atexit)
+is imported on first use.
 """
-import json
-from os import makedirs, rename
-from os.path import dirname, exists, join
+from __future__ import annotations
+
+from _thread import allocate_lock as Lock
+from collections import OrderedDict
+from contextlib import contextmanager
+from os import (O_CREAT, O_RDWR, close, fstat, listdir, makedirs,
+                open as os_open, stat)
+from os.path import dirname, isdir, join
+from time import monotonic, perf_counter
+
+from .codec import dumps, loads
+from .files import atomic_write
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import sqlite3
+    from typing import (Any, Callable, Dict, Hashable, Iterable, Iterator,
+                        List, Tuple)
+
+    # (client_id, applet_name, context)
+    StorageKey = Tuple[int, str, str]
+
+
+class VersionConflict(Exception):
+    """
+    A key was written by someone else between reading and writing it.
+    """
+
+
+class StorageBackend:
+    """
+    Where StorageManager keeps applet state. Backends store the encoded JSON
+    for each (client_id, applet_name, context) key along with a version
+    token that changes every time the key is written. Reading a missing key
+    raises FileNotFoundError regardless of the backend.
+    """
+
+    def read(self, key: StorageKey) -> Tuple[bytes, Hashable]:
+        """
+        Return the stored data for key and its version.
+        """
+        raise NotImplementedError()
+
+    def write(self, key: StorageKey, data: bytes) -> Hashable:
+        """
+        Store data for key and return its new version.
+        """
+        raise NotImplementedError()
+
+    def version(self, key: StorageKey) -> Hashable:
+        """
+        Return the current version of key, or None if it doesn't exist.
+        """
+        raise NotImplementedError()
+
+    def compare_and_write(self, key: StorageKey, data: bytes,
+                          expected: Hashable) -> Hashable:
+        """
+        Store data for key only if its version is still expected (None for
+        a key that must not exist yet), and return the new version. Raises
+        VersionConflict otherwise. The default implementation is only
+        atomic while the key's lock() is held.
+        """
+        if self.version(key) != expected:
+            raise VersionConflict(key)
+        return self.write(key, data)
+
+    def location(self, key: StorageKey) -> Hashable:
+        """
+        Identify where key is stored, so that different backend objects
+        pointing at the same storage share in-process locks.
+        """
+        return (type(self), key)
+
+    @contextmanager
+    def lock(self, key: StorageKey):  # pylint: disable=unused-argument
+        """
+        Hold an exclusive lock on key across processes, yielding whether the
+        lock had to be waited for. Backends without cross-process locks rely
+        on compare_and_write alone.
+        """
+        yield False
+
+    def scan(self, applet_name: str, client_id: int = None) \
+            -> Iterator[Tuple[StorageKey, bytes]]:
+        """
+        Iterate over every stored key for applet_name, optionally limited to
+        one client.
+        """
+        raise NotImplementedError()
+
+    def read_many(self, keys: Iterable[StorageKey]) \
+            -> Dict[StorageKey, Tuple[bytes, Hashable]]:
+        """
+        Read several keys at once, leaving missing keys out of the result.
+        """
+        found = {}
+        for key in keys:
+            try:
+                found[key] = self.read(key)
+            except FileNotFoundError:
+                pass
+        return found
+
+    def write_many(self, items: Dict[StorageKey, bytes]) \
+            -> Dict[StorageKey, Hashable]:
+        """
+        Write several keys at once, returning their new versions.
+        """
+        return {key: self.write(key, data) for key, data in items.items()}
+
+
+class FileBackend(StorageBackend):
+    """
+    One JSON file per key, at applet_directory/client_id/applet/context.json.
+    Versions are the file's (mtime_ns, size).
+    """
+
+    __slots__ = ["applet_directory", "_directories"]
+
+    def __init__(self, applet_directory: str = "/applets"):
+        self.applet_directory = applet_directory
+        self._directories = set()
+
+    def filename(self, key: StorageKey) -> str:
+        client_id, applet_name, context = key
+        return join(self.applet_directory, str(client_id), applet_name,
+                    context + ".json")
+
+    def read(self, key):
+        with open(self.filename(key), "rb") as f:
+            info = fstat(f.fileno())
+            return f.read(), (info.st_mtime_ns, info.st_size)
+
+    def write(self, key, data):
+        filename = self.filename(key)
+        # if directory doesn't exist, make it
+        directory = dirname(filename)
+        if directory not in self._directories:
+            makedirs(directory, exist_ok=True)
+            self._directories.add(directory)
+        atomic_write(filename, data)
+        return self.version(key)
+
+    def version(self, key):
+        try:
+            info = stat(self.filename(key))
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def location(self, key):
+        return self.filename(key)
+
+    @contextmanager
+    def lock(self, key):
+        # pylint: disable=import-outside-toplevel
+        try:
+            import fcntl
+        except ImportError:  # not on Windows, only in-process locks apply
+            yield False
+            return
+        filename = self.filename(key)
+        directory = dirname(filename)
+        if directory not in self._directories:
+            makedirs(directory, exist_ok=True)
+            self._directories.add(directory)
+        # lock a separate file, since writes replace the data file's inode.
+        # One lock file per directory (i.e. per client and applet) keeps the
+        # inode count down at the cost of serializing updates to the
+        # applet's contexts.
+        fd = os_open(join(directory, ".lock"), O_RDWR | O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                contended = False
+            except BlockingIOError:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                contended = True
+            yield contended
+        finally:
+            close(fd)
+
+    def scan(self, applet_name, client_id=None):
+        if client_id is not None:
+            client_dirs = [str(client_id)]
+        else:
+            client_dirs = sorted(listdir(self.applet_directory))
+        for client_dir in client_dirs:
+            directory = join(self.applet_directory, client_dir, applet_name)
+            if not isdir(directory):
+                continue
+            client = int(client_dir) if client_dir.isdigit() else client_dir
+            for name in sorted(listdir(directory)):
+                if not name.endswith(".json"):
+                    continue
+                key = (client, applet_name, name[:-len(".json")])
+                try:
+                    yield key, self.read(key)[0]
+                except FileNotFoundError:
+                    continue
+
+    def keys(self) -> Iterator[StorageKey]:
+        """
+        Every key stored in the tree.
+        """
+        for client_dir in sorted(listdir(self.applet_directory)):
+            if not isdir(join(self.applet_directory, client_dir)):
+                continue
+            for applet_name in sorted(listdir(join(self.applet_directory,
+                                                   client_dir))):
+                client = int(client_dir) if client_dir.isdigit() \
+                    else client_dir
+                for key, _ in self.scan(applet_name, client):
+                    yield key
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Every key in a single SQLite database in WAL mode, so readers never
+    block the writer and cross-client scans by applet are one indexed query.
+    Each thread gets its own connection.
+    """
+
+    __slots__ = ["path", "timeout", "_local"]
+
+    # rows per statement for read_many, below SQLite's variable limit
+    CHUNK_SIZE = 300
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        # pylint: disable=import-outside-toplevel
+        from threading import local
+        self.path = path
+        self.timeout = timeout
+        self._local = local()
+        with self._connection() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS applet_state (
+                    client_id INTEGER NOT NULL,
+                    applet TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (client_id, applet, context)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_applet_state_applet
+                    ON applet_state (applet, client_id, context);
+            """)
+
+    def _connection(self) -> 'sqlite3.Connection':
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # only imported by processes using this backend
+            # pylint: disable=import-outside-toplevel,redefined-outer-name
+            import sqlite3
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def read(self, key):
+        row = self._connection().execute(
+            "SELECT content, version FROM applet_state "
+            "WHERE client_id = ? AND applet = ? AND context = ?",
+            key).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"no applet state for {key}")
+        return row[0].encode(), row[1]
+
+    def write(self, key, data):
+        return self.write_many({key: data})[key]
+
+    def location(self, key):
+        return (self.path, key)
+
+    def compare_and_write(self, key, data, expected):
+        db = self._connection()
+        with db:
+            if expected is None:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO applet_state (client_id, applet, "
+                    "context, content) VALUES (?, ?, ?, ?)",
+                    (*key, data.decode()))
+            else:
+                cursor = db.execute(
+                    "UPDATE applet_state SET content = ?, "
+                    "version = version + 1 WHERE client_id = ? "
+                    "AND applet = ? AND context = ? AND version = ?",
+                    (data.decode(), *key, expected))
+            if cursor.rowcount != 1:
+                raise VersionConflict(key)
+        return 1 if expected is None else expected + 1
+
+    def version(self, key):
+        row = self._connection().execute(
+            "SELECT version FROM applet_state "
+            "WHERE client_id = ? AND applet = ? AND context = ?",
+            key).fetchone()
+        return row[0] if row is not None else None
+
+    def read_many(self, keys):
+        keys = list(keys)
+        found = {}
+        db = self._connection()
+        for start in range(0, len(keys), self.CHUNK_SIZE):
+            chunk = keys[start:start + self.CHUNK_SIZE]
+            placeholders = ", ".join(["(?, ?, ?)"] * len(chunk))
+            rows = db.execute(
+                "SELECT client_id, applet, context, content, version "
+                "FROM applet_state WHERE (client_id, applet, context) "
+                f"IN (VALUES {placeholders})",
+                [value for key in chunk for value in key])
+            for client_id, applet, context, content, version in rows:
+                found[(client_id, applet, context)] = (content.encode(),
+                                                       version)
+        return found
+
+    def write_many(self, items):
+        keys = list(items)
+        versions = {}
+        db = self._connection()
+        with db:
+            db.executemany(
+                "INSERT INTO applet_state (client_id, applet, context, "
+                "content) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (client_id, applet, context) DO UPDATE SET "
+                "content = excluded.content, version = version + 1",
+                [(*key, data.decode()) for key, data in items.items()])
+            # read back before committing, while the write lock keeps other
+            # writers from bumping the versions
+            for start in range(0, len(keys), self.CHUNK_SIZE):
+                chunk = keys[start:start + self.CHUNK_SIZE]
+                placeholders = ", ".join(["(?, ?, ?)"] * len(chunk))
+                rows = db.execute(
+                    "SELECT client_id, applet, context, version "
+                    "FROM applet_state WHERE (client_id, applet, context) "
+                    f"IN (VALUES {placeholders})",
+                    [value for key in chunk for value in key])
+                for client_id, applet, context, version in rows:
+                    versions[(client_id, applet, context)] = version
+        return versions
+
+    def scan(self, applet_name, client_id=None):
+        query = "SELECT client_id, applet, context, content " \
+                "FROM applet_state WHERE applet = ?"
+        params = [applet_name]
+        if client_id is not None:
+            query += " AND client_id = ?"
+            params.append(client_id)
+        query += " ORDER BY client_id, context"
+        for client, applet, context, content in \
+                self._connection().execute(query, params):
+            yield (client, applet, context), content.encode()
+
+
+def import_tree(applet_directory: str, backend: StorageBackend,
+                batch_size: int = 500) -> int:
+    """
+    Copy every key from a FileBackend tree into backend, in batches.
+    Returns the number of keys imported.
+    """
+    source = FileBackend(applet_directory)
+    batch = {}
+    imported = 0
+    for key in source.keys():
+        try:
+            batch[key] = source.read(key)[0]
+        except FileNotFoundError:
+            continue
+        if len(batch) >= batch_size:
+            backend.write_many(batch)
+            imported += len(batch)
+            batch = {}
+    if batch:
+        backend.write_many(batch)
+        imported += len(batch)
+    return imported
+
+
+class LockStats:
+    """
+    Contention statistics for StorageManager.update(), overall and per
+    storage location.
+    """
+
+    __slots__ = ["acquisitions", "contended", "conflicts", "wait_total",
+                 "wait_max", "_keys", "_lock"]
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.conflicts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # location -> [acquisitions, contended, conflicts, wait_total]
+        self._keys = {}
+        self._lock = Lock()
+
+    def record(self, location: Hashable, waited: float, contended: bool):
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            stats = self._keys.setdefault(location, [0, 0, 0, 0.0])
+            stats[0] += 1
+            stats[3] += waited
+            if contended:
+                self.contended += 1
+                stats[1] += 1
+
+    def record_conflict(self, location: Hashable):
+        with self._lock:
+            self.conflicts += 1
+            self._keys.setdefault(location, [0, 0, 0, 0.0])[2] += 1
+
+    def hot_keys(self, count: int = 10) -> List[Tuple[Hashable, dict]]:
+        """
+        The count locations with the most total lock wait time.
+        """
+        with self._lock:
+            hottest = sorted(self._keys.items(), key=lambda x: -x[1][3])
+            return [(location, {"acquisitions": stats[0],
+                                "contended": stats[1],
+                                "conflicts": stats[2],
+                                "wait_total": stats[3]})
+                    for location, stats in hottest[:count]]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "conflicts": self.conflicts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+            }
+
+
+class _KeyLocks:
+    """
+    In-process locks per storage location, dropped once nobody holds or
+    waits for them.
+    """
+
+    __slots__ = ["_locks", "_lock"]
+
+    def __init__(self):
+        # location -> [Lock, number of holders and waiters]
+        self._locks = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def hold(self, location: Hashable):
+        with self._lock:
+            entry = self._locks.setdefault(location, [Lock(), 0])
+            entry[1] += 1
+        contended = not entry[0].acquire(blocking=False)
+        if contended:
+            entry[0].acquire()
+        try:
+            yield contended
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[location]
+
+
+KEY_LOCKS = _KeyLocks()
+LOCK_STATS = LockStats()
+
+
+class _CacheEntry:
+    __slots__ = ["backend", "key", "content", "encoded", "size", "version",
+                 "dirty"]
+
+    def __init__(self, backend: StorageBackend, key: StorageKey, content,
+                 encoded: bytes, size: int, version: Hashable, dirty: bool):
+        self.backend = backend
+        self.key = key
+        self.content = content
+        self.encoded = encoded
+        self.size = size
+        self.version = version
+        self.dirty = dirty
+
+
+class StorageCache:
+    """
+    Write-back cache that can be shared by any number of StorageManagers.
+    Entries are keyed on the backend's location() for each key, so managers
+    with separate backend objects for the same storage share them.
+
+    Loads are served from memory as long as the backend's version of the
+    key is unchanged. Saves only update memory; the latest content of each
+    key is written when flush() is called, at most flush_interval seconds
+    after it was saved (by a background timer), or when more than max_dirty
+    keys or max_dirty_bytes bytes are waiting to be written. Clean entries
+    are evicted least recently used first to stay within max_bytes. Pending
+    writes are flushed at exit.
+
+    Content returned by load() is the cached object itself, not a copy.
+    """
+
+    __slots__ = ["flush_interval", "max_dirty", "max_dirty_bytes",
+                 "max_bytes", "hits", "misses", "saves", "flushes",
+                 "files_written", "bytes_written", "evictions", "_entries",
+                 "_bytes", "_dirty", "_dirty_bytes", "_last_flush", "_timer",
+                 "_lock"]
+
+    def __init__(self, flush_interval: float = 5.0, max_dirty: int = 1000,
+                 max_dirty_bytes: int = 16 * 1024 ** 2,
+                 max_bytes: int = 64 * 1024 ** 2):
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.max_dirty_bytes = max_dirty_bytes
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.flushes = 0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.evictions = 0
+
+        # backend.location(key) -> _CacheEntry
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._dirty = set()
+        self._dirty_bytes = 0
+        # pylint: disable=import-outside-toplevel
+        import atexit
+        from threading import RLock
+        self._last_flush = monotonic()
+        self._timer = None
+        self._lock = RLock()
+        atexit.register(self.flush)
+
+    def _store(self, cache_key: tuple, entry: _CacheEntry):
+        old = self._entries.pop(cache_key, None)
+        if old is not None:
+            self._bytes -= old.size
+            if old.dirty:
+                self._dirty_bytes -= old.size
+        self._entries[cache_key] = entry
+        self._bytes += entry.size
+        if entry.dirty:
+            self._dirty.add(cache_key)
+            self._dirty_bytes += entry.size
+        else:
+            self._dirty.discard(cache_key)
+
+    def _written(self, cache_key: Hashable, entry: _CacheEntry,
+                 version: Hashable):
+        # marked clean one key at a time, so that a backend failing halfway
+        # through a flush leaves only the unwritten keys dirty
+        entry.version = version
+        entry.encoded = None
+        entry.dirty = False
+        self._dirty.discard(cache_key)
+        self._dirty_bytes -= entry.size
+        self.files_written += 1
+        self.bytes_written += entry.size
+
+    def load(self, backend: StorageBackend, key: StorageKey):
+        cache_key = backend.location(key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and (
+                    entry.dirty or entry.version == backend.version(key)):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry.content
+
+            self.misses += 1
+            encoded, version = backend.read(key)
+            content = loads(encoded)
+            self._store(cache_key, _CacheEntry(backend, key, content, None,
+                                               len(encoded), version, False))
+            self._evict()
+            return content
+
+    def save(self, backend: StorageBackend, key: StorageKey, content):
+        with self._lock:
+            encoded = dumps(content)
+            self._store(backend.location(key),
+                        _CacheEntry(backend, key, content, encoded,
+                                    len(encoded), None, True))
+            self.saves += 1
+            if len(self._dirty) > self.max_dirty \
+                    or self._dirty_bytes > self.max_dirty_bytes \
+                    or monotonic() - self._last_flush > self.flush_interval:
+                self.flush()
+            elif self._timer is None:
+                # so idle processes don't keep saves in memory indefinitely
+                # pylint: disable=import-outside-toplevel
+                from threading import Timer
+                self._timer = Timer(self.flush_interval, self._flush_due)
+                self._timer.daemon = True
+                self._timer.start()
+            self._evict()
+
+    def _flush_due(self):
+        with self._lock:
+            self._timer = None
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        """
+        Write every pending save to its backend.
+        """
+        with self._lock:
+            by_backend = {}
+            for cache_key in self._dirty:
+                entry = self._entries[cache_key]
+                by_backend.setdefault(entry.backend, {})[entry.key] = entry
+            for backend, entries in by_backend.items():
+                versions = backend.write_many(
+                    {key: entry.encoded for key, entry in entries.items()})
+                for key, version in versions.items():
+                    self._written(backend.location(key), entries[key],
+                                  version)
+            self._last_flush = monotonic()
+            self.flushes += 1
+            self._evict()
+
+    def flush_key(self, backend: StorageBackend, key: StorageKey):
+        """
+        Write a pending save for key, if there is one.
+        """
+        with self._lock:
+            cache_key = backend.location(key)
+            entry = self._entries.get(cache_key)
+            if entry is None or not entry.dirty:
+                return
+            self._written(cache_key, entry,
+                          backend.write(key, entry.encoded))
+
+    def flush_keys(self, backend: StorageBackend, keys: Iterable[StorageKey]):
+        """
+        Write the pending saves for any of keys in one batch.
+        """
+        with self._lock:
+            entries = {}
+            for key in keys:
+                entry = self._entries.get(backend.location(key))
+                if entry is not None and entry.dirty:
+                    entries[key] = entry
+            if not entries:
+                return
+            versions = backend.write_many(
+                {key: entry.encoded for key, entry in entries.items()})
+            for key, version in versions.items():
+                self._written(backend.location(key), entries[key], version)
+
+    def save_many(self, backend: StorageBackend,
+                  contents: Dict[StorageKey, Any]):
+        """
+        Write several keys straight to backend in one batch, replacing any
+        pending saves for them.
+        """
+        encoded = {key: dumps(content) for key, content in contents.items()}
+        with self._lock:
+            versions = backend.write_many(encoded)
+            for key, version in versions.items():
+                self._store(backend.location(key),
+                            _CacheEntry(backend, key, contents[key], None,
+                                        len(encoded[key]), version, False))
+                self.files_written += 1
+                self.bytes_written += len(encoded[key])
+            self._evict()
+
+    def store(self, backend: StorageBackend, key: StorageKey, content,
+              size: int, version: Hashable):
+        """
+        Record content that was just written to backend with version.
+        """
+        with self._lock:
+            self._store(backend.location(key),
+                        _CacheEntry(backend, key, content, None, size,
+                                    version, False))
+            self._evict()
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        for cache_key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[cache_key]
+            if not entry.dirty:
+                del self._entries[cache_key]
+                self._bytes -= entry.size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "dirty": len(self._dirty),
+                "dirty_bytes": self._dirty_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "saves": self.saves,
+                "flushes": self.flushes,
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "evictions": self.evictions,
+            }
 
 
 class StorageManager:
@@ -11,15 +726,24 @@ class StorageManager:
     Create a StorageManager, either tied to or detached from a specific
     client_id. If a client_id is not passed, it will need to be assigned or
     passed to the method as the last argument.
+
+    State is kept in backend, by default one JSON file per context under
+    applet_directory. Passing a StorageCache makes loads and saves go
+    through it instead of straight to the backend.
     """
-    __slots__ = ["applet_directory", "applet_name", "context", "client_id"]
+    __slots__ = ["applet_directory", "applet_name", "context", "client_id",
+                 "backend", "cache"]
 
     def __init__(self, applet_name: str, context: str, client_id: int = None,
-                 applet_directory: str = "/applets"):
+                 applet_directory: str = "/applets",
+                 cache: StorageCache = None, backend: StorageBackend = None):
         self.applet_directory = applet_directory
         self.applet_name = applet_name
         self.context = context
         self.client_id = client_id
+        self.backend = backend if backend is not None \
+            else FileBackend(applet_directory)
+        self.cache = cache
 
     def _assert_client_id(self, client_id: int = None) -> bool:
         if client_id is None and self.client_id is None:
@@ -27,29 +751,122 @@ class StorageManager:
         else:
             return client_id or self.client_id
 
-    def _get_filename(self, client_id: int = None) -> str:
-        client_id = self._assert_client_id(client_id)
-
-        return join(self.applet_directory, str(client_id), self.applet_name,
-                    self.context + ".json")
+    def _key(self, client_id: int = None) -> StorageKey:
+        return (self._assert_client_id(client_id), self.applet_name,
+                self.context)
 
     def save(self, content: dict, client_id: int = None):
-        client_id = self._assert_client_id(client_id)
-        filename = self._get_filename(client_id)
+        key = self._key(client_id)
+        if self.cache is not None:
+            self.cache.save(self.backend, key, content)
+        else:
+            self.backend.write(key, dumps(content))
 
-        # if directory doesn't exist, make it
-        if not exists(dirname(filename)):
-            makedirs(dirname(filename), exist_ok=True)
+    def load(self, client_id: int = None) -> dict:
+        key = self._key(client_id)
+        if self.cache is not None:
+            return self.cache.load(self.backend, key)
+        return loads(self.backend.read(key)[0])
+
+    def save_many(self, contents: Dict[int, dict]):
+        """
+        Save this applet context for several clients at once, given a dict
+        of client_id to content. Any saves still pending in the cache for
+        these clients are superseded.
+        """
+        contents = {self._key(client_id): content
+                    for client_id, content in contents.items()}
+        if self.cache is not None:
+            self.cache.save_many(self.backend, contents)
+        else:
+            self.backend.write_many({key: dumps(content)
+                                     for key, content in contents.items()})
 
-        # create temporary file with new content
-        with open(filename + "~", "w") as temp_file:
-            json.dump(content, temp_file)
+    def load_many(self, client_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Load this applet context for several clients at once. Clients
+        without saved state are left out of the result.
+        """
+        keys = [self._key(client_id) for client_id in client_ids]
+        if self.cache is not None:
+            self.cache.flush_keys(self.backend, keys)
+        found = self.backend.read_many(keys)
+        return {key[0]: loads(data) for key, (data, _) in found.items()}
 
-        # rename old file
-        filename = self._get_filename(client_id)
-        rename(filename + "~", filename)
+    def scan(self) -> Iterator[Tuple[int, dict]]:
+        """
+        Iterate over (client_id, content) for every client with state saved
+        for this applet context.
+        """
+        if self.cache is not None:
+            self.cache.flush()
+        for key, data in self.backend.scan(self.applet_name):
+            if key[2] == self.context:
+                yield key[0], loads(data)
 
-    def load(self, client_id: int = None) -> dict:
-        filename = self._get_filename(client_id)
-        with open(filename) as f:
-            return json.load(f)
+    def update(self, fn: Callable[[Any], Any], client_id: int = None,
+               default: Any = None, retries: int = 5) -> Any:
+        """
+        Atomically load, modify and save this applet context. fn receives
+        the current content (default if nothing is saved yet) and returns
+        the new content, or None after modifying it in place. The key is
+        locked within this process and, where the backend supports it,
+        across processes; the write is also checked against the version that
+        was read and retried up to retries times on conflict. Returns the
+        saved content.
+        """
+        key = self._key(client_id)
+        location = self.backend.location(key)
+        for _ in range(retries + 1):
+            start = perf_counter()
+            with KEY_LOCKS.hold(location) as contended, \
+                    self.backend.lock(key) as file_contended:
+                LOCK_STATS.record(location, perf_counter() - start,
+                                  contended or file_contended)
+                if self.cache is not None:
+                    self.cache.flush_key(self.backend, key)
+                try:
+                    data, version = self.backend.read(key)
+                    content = loads(data)
+                except FileNotFoundError:
+                    content, version = default, None
+                new_content = fn(content)
+                if new_content is None:
+                    new_content = content
+                encoded = dumps(new_content)
+                try:
+                    new_version = self.backend.compare_and_write(
+                        key, encoded, version)
+                except VersionConflict:
+                    LOCK_STATS.record_conflict(location)
+                    continue
+                if self.cache is not None:
+                    self.cache.store(self.backend, key, new_content,
+                                     len(encoded), new_version)
+                return new_content
+        raise VersionConflict(key)
+
+    def flush(self):
+        """
+        Write any saves still pending in the cache.
+        """
+        if self.cache is not None:
+            self.cache.flush()
+
+
+def main():
+    # pylint: disable=import-outside-toplevel
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Import an applet storage tree into a SQLite backend.")
+    parser.add_argument("applet_directory")
+    parser.add_argument("database")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    count = import_tree(args.applet_directory, SQLiteBackend(args.database),
+                        args.batch_size)
+    print(f"imported {count} applet states")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+JSON codec shared by the config loaders and savers and by applet storage.
+
+Decoding and applet storage encoding use the fastest installed library out
+of orjson, simdjson (pysimdjson) and ujson, falling back to the standard
+library. v6 config files are always encoded with the standard library's
+default separators so their bytes don't depend on which library is installed
+(and unchanged configs are still detected as unchanged on save).
+
+Only the standard library's json is imported with this module. The installed
+libraries are looked up, and the one in use imported, by the first loads() or
+dumps() (or use(), or reading AVAILABLE), since orjson alone costs more import
+time than all of mediapanel.config.
+"""
+from __future__ import annotations
+
+import json
+from math import isfinite
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, List, Union
+
+# imported by use()
+orjson = simdjson = ujson = None
+
+_LIBRARIES = ("orjson", "simdjson", "ujson")
+_available = None
+
+_V6_ENCODER = json.JSONEncoder()
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+    return json.dumps(obj).encode()
+
+
+def _orjson_loads(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # orjson rejects some documents the standard library accepts, such as
+        # integers wider than 64 bits
+        return json.loads(data)
+
+
+def _orjson_dumps(obj) -> bytes:
+    try:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # integers wider than 64 bits
+        return _json_dumps(obj)
+    if b"null" in data and _has_non_finite(obj):
+        # orjson silently writes NaN and infinities as null, which the
+        # standard library keeps
+        return _json_dumps(obj)
+    return data
+
+
+def _has_non_finite(obj) -> bool:
+    stack = [obj]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        obj = pop()
+        kind = type(obj)
+        if kind is dict:
+            extend(obj.values())
+        elif kind is list or kind is tuple:
+            extend(obj)
+        elif kind is float and not isfinite(obj):
+            return True
+    return False
+
+
+def _simdjson_loads(data):
+    return simdjson.loads(data)
+
+
+def _ujson_loads(data):
+    return ujson.loads(data)
+
+
+def _ujson_dumps(obj) -> bytes:
+    return ujson.dumps(obj).encode()
+
+
+_CODECS = {
+    "json": (_json_loads, _json_dumps),
+    "orjson": (_orjson_loads, _orjson_dumps),
+    "simdjson": (_simdjson_loads, _json_dumps),
+    "ujson": (_ujson_loads, _ujson_dumps),
+}
+
+
+def available() -> List[str]:
+    """
+    Names of the installed codecs, "json" first and the fastest second.
+    """
+    # pylint: disable=global-statement,import-outside-toplevel
+    global _available
+    if _available is None:
+        from importlib.util import find_spec
+        _available = ["json"] + [name for name in _LIBRARIES
+                                 if find_spec(name) is not None]
+    return _available
+
+
+def __getattr__(name: str):
+    if name == "AVAILABLE":
+        return available()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def use(name: str):
+    """
+    Switch the codec used by loads() and dumps() to one of AVAILABLE.
+    """
+    # pylint: disable=global-statement,import-outside-toplevel
+    global BACKEND, _loads, _dumps
+    if name not in available():
+        raise ValueError(f"JSON codec {name!r} is not installed, "
+                         f"available: {', '.join(available())}")
+    if name != "json":
+        from importlib import import_module
+        globals()[name] = import_module(name)
+    BACKEND = name
+    _loads, _dumps = _CODECS[name]
+
+
+def _use_default():
+    names = available()
+    use(names[1] if len(names) > 1 else "json")
+
+
+def _first_loads(data):
+    _use_default()
+    return _loads(data)
+
+
+def _first_dumps(obj) -> bytes:
+    _use_default()
+    return _dumps(obj)
+
+
+# set by use(), on the first loads() or dumps() at the latest
+BACKEND = None
+_loads, _dumps = _first_loads, _first_dumps
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode a JSON document, preferably straight from bytes.
+    """
+    return _loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode obj as compact JSON bytes. The exact formatting depends on the
+    codec in use.
+    """
+    return _dumps(obj)
+
+
+def dumps_v6(obj: Any) -> bytes:
+    """
+    Encode obj exactly as json.dumps() would. ConfigSections are converted
+    up front with to_v6_values() instead of through a JSONEncoder.default
+    hook; any nested ConfigSections left in the result are still handled by
+    the default hook.
+    """
+    # imported here since config.section itself uses this module
+    # pylint: disable=import-outside-toplevel
+    from .config.section import JSON_ENCODER, ConfigSection
+    if isinstance(obj, ConfigSection):
+        obj = obj.to_v6_values()
+    try:
+        return _V6_ENCODER.encode(obj).encode()
+    except TypeError:
+        return JSON_ENCODER.encode(obj).encode()
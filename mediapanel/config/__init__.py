@@ -1,9 +1,40 @@
 # flake8: noqa
 """
 Container module for mediaPanel configuration classes.
+
+Classes are imported from their modules on first access, so that importing
+one config type doesn't pay for all of them.
 """
+from importlib import import_module
+
+_EXPORTS = {
+    "GeneralConfig": ".general",
+    "LayoutConfig": ".layout",
+    "EventsConfig": ".events",
+    "AdsConfig": ".ads",
+    "AdsVerticalConfig": ".ads",
+    "AdsHorizontalConfig": ".ads",
+    "LoadResult": ".fleet",
+    "load_many": ".fleet",
+    "ChangeFeed": ".changes",
+    "ConfigChange": ".changes",
+    "Playlist": ".playlist",
+    "PlanResult": ".playlist",
+    "plan_many": ".playlist",
+    "LayoutIndex": ".layout_index",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-from .general import GeneralConfig
-from .layout import LayoutConfig
-from .events import EventsConfig
-from .ads import AdsConfig, AdsVerticalConfig, AdsHorizontalConfig
+def __dir__():
+    return sorted(list(globals()) + __all__)
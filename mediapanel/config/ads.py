@@ -6,6 +6,7 @@ from enum import Enum, auto
 from datetime import datetime
 from typing import List, Tuple
 
+from .schedule import AdSchedule
 from .section import Config
 
 
@@ -15,6 +16,8 @@ class Ad:
         "timeframe",  # Timeframe object
         "playtime",  # If not 0, amount of time an ad should play for
                      # Listed as RUNTIMEAUTO and RUNTIMEINTERVAL in v6 code
+        "interval",  # RUNTIMEINTERVAL as configured, kept while RUNTIMEAUTO
+                     # is set so saving doesn't lose it
 
         # Media
         "background",  # Media displayed in background
@@ -95,9 +98,11 @@ class Ad:
                  lines: List[str],
                  title: str,
                  ident: str,
-                 name: str):
+                 name: str,
+                 interval: int = None):
         self.timeframe = timeframe
         self.playtime = playtime
+        self.interval = playtime if interval is None else interval
         self.background = background
         self.media = media
         self.lines = lines
@@ -115,12 +120,17 @@ class AdsBaseConfig(Config):
     This should not be instantiated directly. You should instead create an
     AdsConfig(), an AdsVerticalConfig(), or an AdsHorizontalConfig().
     """
-    __slots__ = ["ads"]
+    __slots__ = ["ads", "schedule"]
 
     def __init__(self, config, **kwargs):
         super().__init__(**kwargs)
 
         self.ads = config["ads"]
+        # compiled minute-of-week index over self.ads, rebuild with
+        # AdSchedule.from_ads() after changing the ads
+        self.schedule = config.get("schedule")
+        if self.schedule is None:
+            self.schedule = AdSchedule.from_ads(self.ads)
 
     @staticmethod
     def from_v6_values(data):
@@ -156,15 +166,41 @@ class AdsBaseConfig(Config):
             name = ad["NAME"]
 
             ads.append(Ad(timeframe, playtime, background, media_list, lines,
-                          title, ident, name))
+                          title, ident, name, ad["RUNTIMEINTERVAL"]))
 
         return {
-            "ads": ads
+            "ads": ads,
+            "schedule": AdSchedule.from_ads(ads),
         }
 
     def to_v6_values(self):
+        ads = []
+        for ad in self.ads:
+            schedule = {}
+            for day_schedule in ad.timeframe.schedule:
+                schedule[day_schedule.weekday.name] = [{
+                    "OPEN": {"HOUR": f"{runtime.start[0]:02d}",
+                             "MIN": f"{runtime.start[1]:02d}"},
+                    "CLOSE": {"HOUR": f"{runtime.end[0]:02d}",
+                              "MIN": f"{runtime.end[1]:02d}"},
+                } for runtime in day_schedule.runtimes]
+            ads.append({
+                "STARTDATE": ad.timeframe.start_day.strftime("%m/%d/%Y"),
+                "ENDDATE": ad.timeframe.end_day.strftime("%m/%d/%Y"),
+                "SCHEDULE": schedule,
+                "RUNTIMEAUTO": not ad.playtime,
+                "RUNTIMEINTERVAL": ad.playtime or ad.interval,
+                "BACKGROUND": ad.background.media_resource,
+                "BACKGROUNDSOUND": ad.background.is_sound_enabled,
+                "MEDIA": [media.media_resource for media in ad.media],
+                "MEDIASOUND": [media.is_sound_enabled for media in ad.media],
+                "LINES": ad.lines,
+                "TITLE": ad.title,
+                "IDENT": ad.ident,
+                "NAME": ad.name,
+            })
         return {
-            "ADS": []
+            "ADS": ads
         }
 
 
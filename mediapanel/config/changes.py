@@ -0,0 +1,356 @@
+"""
+Change feed over the device_config tree used by Config.from_v6_id, so that
+consumers only re-parse, re-cache or re-sync configs that actually changed.
+
+Changes are detected with inotify when the optional inotify_simple package is
+installed (and the watches fit within the system limit), and otherwise by
+scanning the tree with os.scandir and comparing each file's (mtime_ns, size)
+with the last known state. That state can be persisted to a checkpoint file
+so a restarted consumer only sees what changed while it was down.
+"""
+import logging
+from collections import defaultdict
+from os import scandir, stat
+from os.path import basename, dirname, join, relpath, sep
+from threading import Event
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+from ..codec import dumps, loads
+from ..files import atomic_write
+from .section import DEFAULT_BASE_PATH
+from .snapshot import SECTIONS
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigChange(NamedTuple):
+    """
+    A config file that was created, modified or deleted.
+    """
+    client_id: int
+    device_id: str
+    section: type
+    path: str
+    kind: str
+
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+
+def _relative_paths(section: type) -> List[str]:
+    if isinstance(section.file_path, str):
+        return [section.file_path]
+    return list(section.file_path)
+
+
+class ChangeFeed:
+    """
+    Detect changes to the given config sections for every device under
+    base_path and deliver them to subscribers.
+
+        feed = ChangeFeed(checkpoint_path="/var/lib/sync/config.checkpoint")
+        feed.subscribe(resync, sections=[LayoutConfig])
+        feed.run()
+
+    The first poll without a checkpoint reports every existing file as
+    created.
+    """
+
+    __slots__ = ["base_path", "sections", "checkpoint_path",
+                 "checkpoint_interval", "use_inotify", "rescan_interval",
+                 "_by_relpath", "_directories", "_prefixes", "_state",
+                 "_subscribers", "_inotify", "_watches", "_last_scan",
+                 "_checkpoint_pending", "_last_checkpoint"]
+
+    def __init__(self, base_path: str = DEFAULT_BASE_PATH,
+                 sections: Iterable[type] = SECTIONS,
+                 checkpoint_path: str = None, use_inotify: bool = True,
+                 rescan_interval: float = 3600.0,
+                 checkpoint_interval: float = 60.0):
+        self.base_path = base_path.rstrip(sep)
+        self.sections = list(sections)
+        self.checkpoint_path = checkpoint_path
+        # the checkpoint holds every tracked path, so it is rewritten at most
+        # this often; a restart may see changes again that happened since
+        self.checkpoint_interval = checkpoint_interval
+        self.use_inotify = use_inotify and inotify_simple is not None
+        # full rescans still run this often with inotify, in case events
+        # were missed
+        self.rescan_interval = rescan_interval
+
+        # file path relative to the device directory -> section
+        self._by_relpath = {rel: section for section in self.sections
+                            for rel in _relative_paths(section)}
+        # directory relative to the device -> file names in it
+        self._directories = defaultdict(set)
+        for rel in self._by_relpath:
+            self._directories[dirname(rel)].add(basename(rel))
+        # directories relative to the device leading to the config
+        # directories, including the device directory itself
+        self._prefixes = {""}
+        for directory in self._directories:
+            parts = directory.split(sep) if directory else []
+            self._prefixes.update(join(*parts[:n])
+                                  for n in range(1, len(parts) + 1))
+
+        # path -> (mtime_ns, size)
+        self._state: Dict[str, Tuple[int, int]] = {}
+        self._subscribers = []
+        self._inotify = None
+        self._watches = {}
+        self._last_scan = None
+        self._checkpoint_pending = False
+        self._last_checkpoint = None
+        if checkpoint_path is not None:
+            try:
+                with open(checkpoint_path, "rb") as f:
+                    self._state = {path: tuple(signature) for path, signature
+                                   in loads(f.read()).items()}
+            except FileNotFoundError:
+                pass
+
+    def subscribe(self, callback: Callable[[ConfigChange], None],
+                  sections: Iterable[type] = None):
+        """
+        Call callback for every change, or only for changes to sections.
+        """
+        wanted = set(sections) if sections is not None else None
+        self._subscribers.append((callback, wanted))
+
+    def unsubscribe(self, callback: Callable[[ConfigChange], None]):
+        self._subscribers = [s for s in self._subscribers
+                             if s[0] is not callback]
+
+    def _parse(self, path: str) -> Tuple[int, str, type]:
+        client, _, device_id, rel = relpath(path, self.base_path)\
+            .split(sep, 3)
+        client_id = int(client) if client.isdigit() else client
+        return client_id, device_id, self._by_relpath[rel]
+
+    def _device_dirs(self) -> Iterable[str]:
+        with scandir(self.base_path) as clients:
+            client_dirs = [c.path for c in clients if c.is_dir()]
+        for client_dir in client_dirs:
+            try:
+                with scandir(join(client_dir, "1")) as devices:
+                    yield from (d.path for d in devices if d.is_dir())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _scan_device(self, device_dir: str, seen: Dict[str, tuple]):
+        for directory, names in self._directories.items():
+            try:
+                with scandir(join(device_dir, directory)) as entries:
+                    for entry in entries:
+                        if entry.name in names and entry.is_file():
+                            info = entry.stat()
+                            seen[entry.path] = (info.st_mtime_ns,
+                                                info.st_size)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _diff(self, seen: Dict[str, tuple],
+              checked: Iterable[str]) -> List[ConfigChange]:
+        """
+        Compare the signatures in seen against the known state for every
+        path in checked; paths in checked but not in seen were deleted.
+        """
+        changes = []
+        for path in checked:
+            old = self._state.get(path)
+            new = seen.get(path)
+            if old == new:
+                continue
+            if new is None:
+                del self._state[path]
+                kind = DELETED
+            else:
+                self._state[path] = new
+                kind = CREATED if old is None else MODIFIED
+            changes.append(ConfigChange(*self._parse(path), path, kind))
+        return changes
+
+    def scan(self) -> List[ConfigChange]:
+        """
+        Rescan the whole tree and return the changes since the last poll.
+        """
+        seen = {}
+        for device_dir in self._device_dirs():
+            self._scan_device(device_dir, seen)
+        self._last_scan = monotonic()
+        return self._diff(seen, set(seen) | set(self._state))
+
+    @staticmethod
+    def _mask() -> int:
+        flags = inotify_simple.flags
+        return flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE \
+            | flags.DELETE | flags.MOVED_FROM
+
+    def _subdirectories(self, path: str) -> List[str]:
+        try:
+            with scandir(path) as entries:
+                return [e.path for e in entries if e.is_dir()]
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def _watch_tree(self, path: str) -> List[str]:
+        """
+        Watch path, a directory under base_path, and every existing directory
+        below it leading to config files: client directories, their device
+        directories and the config directories of each device. Returns the
+        device directories at or below path, since their files may have been
+        written before the watches were added.
+        """
+        rel = relpath(path, self.base_path)
+        parts = [] if rel == "." else rel.split(sep)
+        if len(parts) == 0:
+            children = self._subdirectories(path)
+        elif len(parts) == 1:
+            children = [join(path, "1")]
+        elif parts[1] != "1":
+            return []
+        elif len(parts) == 2:
+            children = self._subdirectories(path)
+        else:
+            device_rel = join(*parts[3:]) if len(parts) > 3 else ""
+            if device_rel not in self._prefixes:
+                return []
+            children = [child for child in self._subdirectories(path)
+                        if join(device_rel, basename(child))
+                        in self._prefixes]
+        try:
+            self._watches[self._inotify.add_watch(path, self._mask())] = path
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+        if len(parts) > 2:
+            # below a device, the children belong to the same device
+            for child in children:
+                self._watch_tree(child)
+            return [join(self.base_path, *parts[:3])]
+        devices = []
+        for child in children:
+            devices.extend(self._watch_tree(child))
+        return devices
+
+    def _stop_inotify(self):
+        # most likely out of watches; fall back to scanning
+        self._inotify.close()
+        self._inotify = None
+        self._watches = {}
+        self.use_inotify = False
+
+    def _start_inotify(self) -> bool:
+        self._inotify = inotify_simple.INotify()
+        try:
+            self._watch_tree(self.base_path)
+        except OSError:
+            self._stop_inotify()
+            return False
+        return True
+
+    def _read_inotify(self, timeout: float) -> List[ConfigChange]:
+        flags = inotify_simple.flags
+        events = self._inotify.read(timeout=int(timeout * 1000))
+        seen, checked = {}, set()
+        for event in events:
+            if event.mask & flags.Q_OVERFLOW:
+                return self.scan()
+            directory = self._watches.get(event.wd)
+            if directory is None:
+                continue
+            path = join(directory, event.name)
+            if event.mask & flags.ISDIR:
+                # a new client, device or config directory
+                if event.mask & (flags.CREATE | flags.MOVED_TO):
+                    try:
+                        device_dirs = self._watch_tree(path)
+                    except OSError:
+                        self._stop_inotify()
+                        return self.scan()
+                    for device_dir in device_dirs:
+                        device_seen = {}
+                        self._scan_device(device_dir, device_seen)
+                        seen.update(device_seen)
+                        checked.update(device_seen)
+                continue
+            try:
+                self._parse(path)
+            except (KeyError, ValueError):
+                continue
+            checked.add(path)
+            try:
+                info = stat(path)
+                seen[path] = (info.st_mtime_ns, info.st_size)
+            except FileNotFoundError:
+                seen.pop(path, None)
+        return self._diff(seen, checked)
+
+    def poll(self, timeout: float = 0) -> List[ConfigChange]:
+        """
+        Collect changes since the last poll, waiting up to timeout seconds
+        for inotify events, deliver them to subscribers and update the
+        checkpoint (at most every checkpoint_interval seconds). Exceptions
+        raised by subscribers are logged. Returns the changes.
+        """
+        if self.use_inotify and self._inotify is None:
+            # watch before the first scan, so that nothing changing during
+            # or right after it is missed
+            self._start_inotify()
+        if self._inotify is not None and self._last_scan is not None and \
+                monotonic() - self._last_scan < self.rescan_interval:
+            changes = self._read_inotify(timeout)
+        else:
+            changes = self.scan()
+
+        for change in changes:
+            for callback, wanted in self._subscribers:
+                if wanted is None or change.section in wanted:
+                    # the change is already recorded as seen, so one failing
+                    # subscriber must not keep it from the others
+                    try:
+                        callback(change)
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception("Subscriber %r failed on %s",
+                                         callback, change)
+        if changes and self.checkpoint_path is not None:
+            self._checkpoint_pending = True
+        if self._checkpoint_pending and (
+                self._last_checkpoint is None or
+                monotonic() - self._last_checkpoint
+                >= self.checkpoint_interval):
+            self.save_checkpoint()
+        return changes
+
+    def save_checkpoint(self):
+        atomic_write(self.checkpoint_path, dumps(self._state))
+        self._checkpoint_pending = False
+        self._last_checkpoint = monotonic()
+
+    def run(self, interval: float = 5.0, stop: Event = None):
+        """
+        Poll until stop is set, every interval seconds when scanning or as
+        soon as events arrive with inotify.
+        """
+        stop = stop or Event()
+        while not stop.is_set():
+            self.poll(interval if self._inotify is not None else 0)
+            if self._inotify is None:
+                stop.wait(interval)
+        if self._checkpoint_pending:
+            self.save_checkpoint()
+
+    def close(self):
+        if self._checkpoint_pending:
+            self.save_checkpoint()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
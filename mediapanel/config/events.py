@@ -1,8 +1,10 @@
 """
 Events device configuration.
 """
-from datetime import datetime
-from typing import List, Tuple
+from bisect import bisect_left, bisect_right
+from calendar import isleap
+from datetime import date, datetime
+from typing import Iterable, List, Tuple
 
 from .section import Config
 
@@ -17,24 +19,34 @@ class Event:
 
 class Person:
     """
-    A person that can have Events.
+    A person that can have Events. When the person belongs to an EventsConfig,
+    index is that config's EventIndex and is kept up to date by add_event and
+    remove_event.
     """
 
-    __slots__ = ["name", "events"]
+    __slots__ = ["name", "events", "index"]
 
     def __init__(self, person_name: str,
                  events: List[Tuple[Event, datetime]] = None):
         self.name = person_name
         self.events = events if events is not None else []
+        self.index = None
 
     def add_event(self, event: Event, date: datetime):
         self.events.append((event, date.date()))
+        if self.index is not None:
+            self.index.add(self, event, date.date())
 
-    def remove_event(event: Event, date: datetime = None):
+    def remove_event(self, event: Event, date: datetime = None):
         if date is not None:
-            self.events.remove((event, date.date()))
+            removed = [(event, date.date())]
+            self.events.remove(removed[0])
         else:
+            removed = [e for e in self.events if e[0] == event]
             self.events = [e for e in self.events if e[0] != event]
+        if self.index is not None:
+            for removed_event, day in removed:
+                self.index.remove(self, removed_event, day)
 
 
 class EventList:
@@ -52,19 +64,169 @@ class EventList:
     def add_event(self, person: Person, date: datetime):
         self.events.append((person, date.date()))
 
-    def remove_event(person: Person, date: datetime = None):
+    def remove_event(self, person: Person, date: datetime = None):
         if date is not None:
             self.events.remove((person, date.date()))
         else:
             self.events = [e for e in self.events if e[0] != person]
 
 
+def _annual_key(day: date) -> int:
+    return day.month * 32 + day.day
+
+
+_FEB_28 = _annual_key(date(2000, 2, 28))
+_FEB_29 = _annual_key(date(2000, 2, 29))
+
+
+def _occurrence(day: date, year: int) -> date:
+    """
+    Anniversary of day in year. Leap day events fall on February 28th in
+    non-leap years.
+    """
+    if day.month == 2 and day.day == 29 and not isleap(year):
+        return date(year, 2, 28)
+    return day.replace(year=year)
+
+
+class EventIndex:
+    """
+    Sorted, bisectable index over every (person, event, date) in an
+    EventsConfig, ordered both by exact date and by month and day for
+    annually recurring events such as birthdays.
+
+    The index mirrors Person.events, which is also what gets saved by
+    EventsConfig.to_v6_values(). Queries return (date, person, event) tuples
+    ordered by date, where date is the exact date for exact queries and the
+    occurrence date for annual queries.
+    """
+
+    __slots__ = ["_keys", "_entries", "_annual_keys", "_annual_entries"]
+
+    def __init__(self, entries: Iterable[Tuple[Person, Event, date]] = ()):
+        entries = list(entries)
+        exact = sorted(entries, key=lambda e: e[2])
+        self._keys = [e[2].toordinal() for e in exact]
+        self._entries = exact
+        annual = sorted(entries, key=lambda e: _annual_key(e[2]))
+        self._annual_keys = [_annual_key(e[2]) for e in annual]
+        self._annual_entries = annual
+
+    @classmethod
+    def from_people(cls, people: List[Person]) -> 'EventIndex':
+        """
+        Build an index over people and attach it to each of them.
+        """
+        index = cls((person, event, day)
+                    for person in people for event, day in person.events)
+        for person in people:
+            person.index = index
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _insert(keys: list, entries: list, key: int, entry: tuple):
+        pos = bisect_right(keys, key)
+        keys.insert(pos, key)
+        entries.insert(pos, entry)
+
+    @staticmethod
+    def _remove(keys: list, entries: list, key: int, entry: tuple):
+        for pos in range(bisect_left(keys, key), bisect_right(keys, key)):
+            found = entries[pos]
+            if found[0] is entry[0] and found[1] is entry[1] \
+                    and found[2] == entry[2]:
+                del keys[pos]
+                del entries[pos]
+                return
+        raise ValueError("event is not in the index")
+
+    def add(self, person: Person, event: Event, day: date):
+        entry = (person, event, day)
+        self._insert(self._keys, self._entries, day.toordinal(), entry)
+        self._insert(self._annual_keys, self._annual_entries,
+                     _annual_key(day), entry)
+
+    def remove(self, person: Person, event: Event, day: date):
+        entry = (person, event, day)
+        self._remove(self._keys, self._entries, day.toordinal(), entry)
+        self._remove(self._annual_keys, self._annual_entries,
+                     _annual_key(day), entry)
+
+    def on(self, day: date) -> List[Tuple[date, Person, Event]]:
+        """
+        Events happening exactly on day.
+        """
+        return self.between(day, day)
+
+    def between(self, start: date, end: date) \
+            -> List[Tuple[date, Person, Event]]:
+        """
+        Events with an exact date between start and end, inclusive.
+        """
+        lo = bisect_left(self._keys, start.toordinal())
+        hi = bisect_right(self._keys, end.toordinal())
+        return [(e[2], e[0], e[1]) for e in self._entries[lo:hi]]
+
+    def upcoming(self, start: date, count: int) \
+            -> List[Tuple[date, Person, Event]]:
+        """
+        The first count events with an exact date on or after start.
+        """
+        lo = bisect_left(self._keys, start.toordinal())
+        return [(e[2], e[0], e[1]) for e in self._entries[lo:lo + count]]
+
+    def anniversaries_on(self, day: date) -> List[Tuple[date, Person, Event]]:
+        """
+        Events recurring on day's month and day, in any year.
+        """
+        return self.anniversaries_between(day, day)
+
+    def anniversaries_between(self, start: date, end: date) \
+            -> List[Tuple[date, Person, Event]]:
+        """
+        Yearly occurrences of events between start and end, inclusive.
+        """
+        results = []
+        for year in range(start.year, end.year + 1):
+            lo_key = _annual_key(start if year == start.year
+                                 else date(year, 1, 1))
+            hi_key = _annual_key(end if year == end.year
+                                 else date(year, 12, 31))
+            if not isleap(year) and hi_key == _FEB_28:
+                hi_key = _FEB_29
+            lo = bisect_left(self._annual_keys, lo_key)
+            hi = bisect_right(self._annual_keys, hi_key)
+            results.extend((_occurrence(e[2], year), e[0], e[1])
+                           for e in self._annual_entries[lo:hi])
+        return results
+
+    def upcoming_anniversaries(self, start: date, count: int) \
+            -> List[Tuple[date, Person, Event]]:
+        """
+        The next count yearly occurrences of events on or after start.
+        """
+        total = len(self._annual_entries)
+        if not total:
+            return []
+        first = bisect_left(self._annual_keys, _annual_key(start))
+        results = []
+        for offset in range(count):
+            pos = first + offset
+            year = start.year + pos // total
+            entry = self._annual_entries[pos % total]
+            results.append((_occurrence(entry[2], year), entry[0], entry[1]))
+        return results
+
+
 class EventsConfig(Config):
     """
     Information about configured events and people who have events.
     """
 
-    __slots__ = ["events", "people"]
+    __slots__ = ["events", "people", "index"]
     file_path = "home/mediapanel/themes/events/eventsConfig.json"
 
     def __init__(self, config, **kwargs):
@@ -72,7 +234,7 @@ class EventsConfig(Config):
 
         self.events = config["events"]
         self.people = config["people"]
-
+        self.index = EventIndex.from_people(self.people)
 
     @staticmethod
     def from_v6_values(data):
@@ -89,8 +251,8 @@ class EventsConfig(Config):
             person_obj = Person(person["NAME"])
             for event_name, event_dates in person["EVENTS"].items():
                 event_obj = event_categories[event_name]
-                for date in event_dates:
-                    dt = datetime.strptime(date, "%m/%d/%Y")
+                for date_str in event_dates:
+                    dt = datetime.strptime(date_str, "%m/%d/%Y")
                     person_obj.add_event(event_obj, dt)
                     event_lists[event_name].add_event(person_obj, dt)
             people.append(person_obj)
@@ -104,8 +266,8 @@ class EventsConfig(Config):
         people_list = []
         for person in self.people:
             event_categories = {}
-            for event, date in person.events:
-                date_str = date.strftime("%m/%d/%Y")
+            for event, day in person.events:
+                date_str = day.strftime("%m/%d/%Y")
                 if event.name not in event_categories:
                     event_categories[event.name] = [date_str]
                 else:
@@ -0,0 +1,92 @@
+"""
+Bulk loading of device configurations for many devices at once.
+"""
+from os import cpu_count
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from typing import (Callable, Hashable, Iterable, Iterator, NamedTuple,
+                    Sequence, Tuple)
+
+from .general import GeneralConfig
+from .layout import LayoutConfig
+from .section import DEFAULT_BASE_PATH, Config
+
+
+class LoadResult(NamedTuple):
+    """
+    Outcome of loading one config section for one device. Exactly one of
+    config and error is set.
+    """
+    client_id: int
+    device_id: str
+    section: type
+    config: Config
+    error: Exception
+
+
+def _load(section: type, client_id: int, device_id: str, base_path: str,
+          cached: bool, interned: bool, read_only: bool) -> Config:
+    return section.from_v6_id(client_id, device_id, base_path, cached,
+                              interned, read_only)
+
+
+def load_many(client_device_pairs: Iterable[Tuple[int, str]],
+              sections: Sequence[type] = (GeneralConfig, LayoutConfig),
+              base_path: str = DEFAULT_BASE_PATH,
+              max_workers: int = None,
+              processes: bool = False,
+              cached: bool = False,
+              interned: bool = False,
+              read_only: bool = False) -> Iterator[LoadResult]:
+    """
+    Load every section for every (client_id, device_id) pair, fanning file
+    reads and JSON decoding out over a thread pool, or a process pool when
+    processes is True. Results are yielded as soon as they complete, and a
+    failure to load one section is reported in its LoadResult rather than
+    raised.
+
+    With cached, configs are shared through CONFIG_CACHE, except when
+    decoded in worker processes. With interned, identical config files are
+    parsed once, and with read_only as well, devices with identical config
+    files share one parsed config that must not be modified (see
+    mediapanel.config.intern); this only helps with threads.
+    """
+    jobs = (((client_id, device_id, section), _load,
+             (section, client_id, device_id, base_path,
+              cached and not processes, interned, read_only))
+            for client_id, device_id in client_device_pairs
+            for section in sections)
+    for (client_id, device_id, section), config, error in \
+            run_bounded(jobs, max_workers, processes):
+        yield LoadResult(client_id, device_id, section, config, error)
+
+
+def run_bounded(jobs: Iterable[Tuple[Hashable, Callable, tuple]],
+                max_workers: int = None,
+                processes: bool = False) -> Iterator[tuple]:
+    """
+    Run func(*args) for every (key, func, args) job on a thread pool, or a
+    process pool when processes is True, yielding (key, result, error)
+    tuples as jobs complete. Only a bounded number of jobs is submitted at a
+    time, so huge fleets don't materialize every future up front.
+    """
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_cls(max_workers) as executor:
+        max_pending = (max_workers or cpu_count() or 1) * 8
+        pending = {}
+
+        def drain():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                error = future.exception()
+                result = None if error is not None else future.result()
+                yield key, result, error
+
+        for key, func, args in jobs:
+            pending[executor.submit(func, *args)] = key
+            if len(pending) >= max_pending:
+                yield from drain()
+
+        while pending:
+            yield from drain()
@@ -0,0 +1,174 @@
+"""
+Content-addressed sharing of parsed configs across devices.
+
+Devices in a group usually carry byte-identical config files. Interned loads
+hash the raw file bytes and parse each unique content once; every device then
+gets a thin copy of the config class whose attributes point at that one shared
+object graph, with only the path being its own. Nothing keeps the nested lists
+and objects from being modified, and a change would show up on every device
+sharing them, so Config.from_v6_file only hands these copies out when asked
+for read_only, and otherwise returns a private deep copy from edit().
+"""
+from copy import deepcopy
+from enum import Enum
+from hashlib import sha256
+from sys import getsizeof
+from threading import Lock
+from typing import Callable, Dict, List
+
+
+def _slot_names(cls: type) -> List[str]:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(name for name in slots if name not in names)
+    return names
+
+
+def deep_sizeof(obj) -> int:
+    """
+    Approximate number of bytes held by obj and everything it references,
+    counting shared objects once. Classes, modules and enum members are not
+    counted.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, Enum)) \
+                or type(obj).__name__ == "module":
+            continue
+        seen.add(id(obj))
+        size += getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float)):
+            for name in _slot_names(type(obj)):
+                value = getattr(obj, name, None)
+                if value is not None:
+                    stack.append(value)
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+    return size
+
+
+def share(shared, path: str):
+    """
+    New instance of shared's class referencing shared's attributes, with its
+    own path.
+    """
+    obj = type(shared).__new__(type(shared))
+    for name in _slot_names(type(shared)):
+        try:
+            setattr(obj, name, getattr(shared, name))
+        except AttributeError:
+            continue
+    obj.path = path
+    return obj
+
+
+def edit(config):
+    """
+    Private, mutable deep copy of an interned config, with the same path.
+    """
+    return deepcopy(config)
+
+
+class ConfigInterner:
+    """
+    Registry of the unique parsed contents loaded per config class. Each
+    (class, path) references one content, and a content is dropped once no
+    path references it any more.
+    """
+
+    __slots__ = ["_shared", "_paths", "_lock"]
+
+    def __init__(self):
+        # (cls, digest) -> [shared object, references, deep size]
+        self._shared: Dict[tuple, list] = {}
+        # (cls, path) -> digest
+        self._paths: Dict[tuple, bytes] = {}
+        self._lock = Lock()
+
+    def intern(self, cls: type, path: str, content: bytes,
+               parse: Callable[[bytes, str], object]):
+        """
+        Return a copy of the shared config parsed from content, parsing it
+        with parse(content, path) only if it wasn't seen before.
+        """
+        digest = sha256(content).digest()
+        key = (cls, digest)
+        with self._lock:
+            known = key in self._shared
+        parsed = None
+        if not known:
+            # parse outside the lock; another thread may get there first
+            shared = parse(content, path)
+            parsed = [shared, 0, deep_sizeof(shared)]
+        with self._lock:
+            # looked up again, since the entry may have been released and
+            # dropped in the meantime
+            entry = self._shared.get(key)
+            if entry is None:
+                if parsed is None:
+                    shared = parse(content, path)
+                    parsed = [shared, 0, deep_sizeof(shared)]
+                entry = self._shared[key] = parsed
+            previous = self._paths.get((cls, path))
+            if previous != digest:
+                if previous is not None:
+                    self._release(cls, previous)
+                self._paths[(cls, path)] = digest
+                entry[1] += 1
+            return share(entry[0], path)
+
+    def _release(self, cls: type, digest: bytes):
+        entry = self._shared[(cls, digest)]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._shared[(cls, digest)]
+
+    def release(self, cls: type, path: str):
+        """
+        Forget that path references its content.
+        """
+        with self._lock:
+            digest = self._paths.pop((cls, path), None)
+            if digest is not None:
+                self._release(cls, digest)
+
+    def clear(self):
+        with self._lock:
+            self._shared.clear()
+            self._paths.clear()
+
+    def stats(self) -> dict:
+        """
+        Unique contents, references to them, the dedup ratio (references per
+        unique content) and an estimate of the bytes shared and saved
+        compared with parsing every file separately.
+        """
+        with self._lock:
+            entries = list(self._shared.values())
+        unique = len(entries)
+        references = sum(entry[1] for entry in entries)
+        shared_bytes = sum(entry[2] for entry in entries)
+        copy_bytes = sum(entry[1] * getsizeof(share(entry[0], ""))
+                         for entry in entries)
+        unshared_bytes = sum(entry[1] * entry[2] for entry in entries)
+        return {
+            "unique": unique,
+            "references": references,
+            "dedup_ratio": references / unique if unique else 0.0,
+            "bytes_shared": shared_bytes,
+            "bytes_saved": unshared_bytes - shared_bytes - copy_bytes,
+        }
+
+
+INTERNER = ConfigInterner()
@@ -0,0 +1,336 @@
+"""
+Columnar index of the layouts of a whole fleet, for questions such as "which
+devices run an app in a zone of at least N pixels" without walking every
+LayoutConfig.
+
+Per-device settings and per-zone geometry are stored in arrays, one slot per
+device row or zone, and boolean properties and app membership as bitmaps over
+device rows and zones, kept in bytearrays so refreshing a device only flips a
+few bits. Zone area, width and height also get a bitmap of zones per distinct
+value, since zone sizes in a fleet come from a handful of layout templates, so
+a minimum size is answered by or-ing the bitmaps of the sizes reaching it.
+Queries turn bitmaps into integer bitsets, combine them with integer
+operations and return a bitset of device rows, turned into devices with
+LayoutIndex.devices().
+"""
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+from .fleet import load_many
+from .layout import LayoutConfig
+from .section import DEFAULT_BASE_PATH
+
+DeviceKey = Tuple[int, str]
+
+
+def _set(bitmap: bytearray, i: int):
+    if i >> 3 >= len(bitmap):
+        bitmap.extend(bytes((i >> 3) - len(bitmap) + 1))
+    bitmap[i >> 3] |= 1 << (i & 7)
+
+
+def _clear(bitmap: bytearray, i: int):
+    if i >> 3 < len(bitmap):
+        bitmap[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+
+def _bits(bitmap: bytearray) -> int:
+    return int.from_bytes(bitmap, "little")
+
+
+# set bit positions of every byte value
+_BYTE_BITS = [tuple(j for j in range(8) if byte >> j & 1)
+              for byte in range(256)]
+
+
+def bit_indices(bits: int) -> List[int]:
+    """
+    Indices of the set bits of a non-negative bitset, in ascending order.
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    byte_bits = _BYTE_BITS
+    return [i << 3 | j for i, byte in enumerate(data) if byte
+            for j in byte_bits[byte]]
+
+
+def _overlaps(zones: List[Tuple[int, int, int, int]]) -> bool:
+    for i, (x1, y1, x2, y2) in enumerate(zones):
+        for ox1, oy1, ox2, oy2 in zones[i + 1:]:
+            if x1 < ox2 and ox1 < x2 and y1 < oy2 and oy1 < y2:
+                return True
+    return False
+
+
+class LayoutIndex:
+    """
+    Layout settings and zones of many devices, refreshable per device.
+
+        index = LayoutIndex.from_fleet(pairs)
+        rows = index.with_app("weather", min_area=1920 * 540) \\
+            & index.where(vertical=True)
+        affected = index.devices(rows)
+    """
+
+    __slots__ = [
+        "base_path",
+        # device rows
+        "keys", "layout", "zone_count", "_present", "_vertical", "_scroller",
+        "_minizone", "_overlapping", "_rows", "_free_rows", "_device_zones",
+        # zones
+        "zone_device", "x1", "y1", "x2", "y2", "area", "_zone_apps",
+        "_free_zones", "_zones",
+        # size -> bitmap of the zones of that size
+        "_areas", "_widths", "_heights",
+        # app -> bitmaps of the device rows and the zones running it
+        "_app_devices", "_app_zones",
+    ]
+
+    def __init__(self, base_path: str = DEFAULT_BASE_PATH):
+        self.base_path = base_path
+
+        self.keys: List[DeviceKey] = []
+        self.layout = array("l")
+        self.zone_count = array("l")
+        self._present = bytearray()
+        self._vertical = bytearray()
+        self._scroller = bytearray()
+        self._minizone = bytearray()
+        self._overlapping = bytearray()
+        self._rows: Dict[DeviceKey, int] = {}
+        self._free_rows = []
+        self._device_zones: List[List[int]] = []
+
+        self.zone_device = array("l")
+        self.x1 = array("l")
+        self.y1 = array("l")
+        self.x2 = array("l")
+        self.y2 = array("l")
+        self.area = array("q")
+        self._zone_apps = []
+        self._free_zones = []
+        self._zones = bytearray()
+        self._areas: Dict[int, bytearray] = {}
+        self._widths: Dict[int, bytearray] = {}
+        self._heights: Dict[int, bytearray] = {}
+
+        self._app_devices: Dict[str, bytearray] = {}
+        self._app_zones: Dict[str, bytearray] = {}
+
+    @classmethod
+    def build(cls, layouts: Iterable[Tuple[int, str, LayoutConfig]],
+              base_path: str = DEFAULT_BASE_PATH) -> 'LayoutIndex':
+        index = cls(base_path)
+        for client_id, device_id, layout in layouts:
+            index.add(client_id, device_id, layout)
+        return index
+
+    @classmethod
+    def from_fleet(cls, client_device_pairs: Iterable[DeviceKey],
+                   base_path: str = DEFAULT_BASE_PATH,
+                   max_workers: int = None) -> 'LayoutIndex':
+        """
+        Load and index the LayoutConfig of every (client_id, device_id)
+        pair. Devices whose layout fails to load are left out.
+        """
+        results = load_many(client_device_pairs, [LayoutConfig], base_path,
+                            max_workers)
+        return cls.build(((r.client_id, r.device_id, r.config)
+                          for r in results if r.error is None), base_path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: DeviceKey) -> bool:
+        return key in self._rows
+
+    def _new_row(self, key: DeviceKey) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self.keys[row] = key
+        else:
+            row = len(self.keys)
+            self.keys.append(key)
+            self.layout.append(0)
+            self.zone_count.append(0)
+            self._device_zones.append([])
+        self._rows[key] = row
+        return row
+
+    def _new_zone(self, row: int) -> int:
+        if self._free_zones:
+            zone = self._free_zones.pop()
+            self.zone_device[zone] = row
+        else:
+            zone = len(self.zone_device)
+            self.zone_device.append(row)
+            for column in (self.x1, self.y1, self.x2, self.y2, self.area):
+                column.append(0)
+            self._zone_apps.append(())
+        _set(self._zones, zone)
+        return zone
+
+    def _zone_sizes(self, zone: int) -> Iterable[Tuple[dict, int]]:
+        return ((self._areas, self.area[zone]),
+                (self._widths, self.x2[zone] - self.x1[zone]),
+                (self._heights, self.y2[zone] - self.y1[zone]))
+
+    def _clear_row(self, row: int):
+        for bitmap in (self._present, self._vertical, self._scroller,
+                       self._minizone, self._overlapping):
+            _clear(bitmap, row)
+        for zone in self._device_zones[row]:
+            for app in self._zone_apps[zone]:
+                _clear(self._app_zones[app], zone)
+                _clear(self._app_devices[app], row)
+            self._zone_apps[zone] = ()
+            for sizes, size in self._zone_sizes(zone):
+                _clear(sizes[size], zone)
+                if not any(sizes[size]):
+                    del sizes[size]
+            _clear(self._zones, zone)
+            self.zone_device[zone] = -1
+            self._free_zones.append(zone)
+        self._device_zones[row] = []
+
+    def add(self, client_id: int, device_id: str, layout: LayoutConfig):
+        """
+        Index a device's layout, replacing what was indexed for it before.
+        """
+        key = (client_id, device_id)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._new_row(key)
+        else:
+            self._clear_row(row)
+
+        _set(self._present, row)
+        if layout.vertical:
+            _set(self._vertical, row)
+        if layout.scroller:
+            _set(self._scroller, row)
+        if layout.minizone:
+            _set(self._minizone, row)
+        self.layout[row] = int(layout.layout)
+        self.zone_count[row] = len(layout.zones)
+
+        geometry = []
+        for section in layout.zones:
+            zone = self._new_zone(row)
+            x1, y1, x2, y2 = (int(section.x1), int(section.y1),
+                              int(section.x2), int(section.y2))
+            self.x1[zone], self.y1[zone] = x1, y1
+            self.x2[zone], self.y2[zone] = x2, y2
+            self.area[zone] = max(0, x2 - x1) * max(0, y2 - y1)
+            for sizes, size in self._zone_sizes(zone):
+                _set(sizes.setdefault(size, bytearray()), zone)
+            apps = tuple(dict.fromkeys(section.apps))
+            self._zone_apps[zone] = apps
+            for app in apps:
+                _set(self._app_zones.setdefault(app, bytearray()), zone)
+                _set(self._app_devices.setdefault(app, bytearray()), row)
+            self._device_zones[row].append(zone)
+            geometry.append((x1, y1, x2, y2))
+        if _overlaps(geometry):
+            _set(self._overlapping, row)
+
+    def remove(self, client_id: int, device_id: str):
+        row = self._rows.pop((client_id, device_id), None)
+        if row is not None:
+            self._clear_row(row)
+            self._free_rows.append(row)
+
+    def refresh(self, client_id: int, device_id: str):
+        """
+        Reload a device's LayoutConfig from base_path and re-index it, or
+        drop it from the index if its layout no longer exists.
+        """
+        try:
+            layout = LayoutConfig.from_v6_id(client_id, device_id,
+                                             self.base_path)
+        except FileNotFoundError:
+            self.remove(client_id, device_id)
+        else:
+            self.add(client_id, device_id, layout)
+
+    def on_change(self, change):
+        """
+        ChangeFeed subscriber keeping the index current:
+
+            feed.subscribe(index.on_change, sections=[LayoutConfig])
+        """
+        if change.section is LayoutConfig:
+            self.refresh(change.client_id, change.device_id)
+
+    def zones_where(self, min_area: int = 0, min_width: int = 0,
+                    min_height: int = 0, zones: int = None) -> int:
+        """
+        Bitset of the live zones at least as large as given, only looking
+        at the zones in the zones bitset if given.
+        """
+        bits = _bits(self._zones)
+        if zones is not None:
+            bits &= zones
+        for minimum, sizes in ((min_area, self._areas),
+                               (min_width, self._widths),
+                               (min_height, self._heights)):
+            if minimum > 0 and bits:
+                large = 0
+                for size, bitmap in sizes.items():
+                    if size >= minimum:
+                        large |= _bits(bitmap)
+                bits &= large
+        return bits
+
+    def zone_devices(self, zone_bits: int) -> int:
+        """
+        Bitset of the device rows owning any of the zones in zone_bits.
+        """
+        bitmap = bytearray((len(self.keys) + 7) >> 3)
+        for zone in bit_indices(zone_bits):
+            row = self.zone_device[zone]
+            bitmap[row >> 3] |= 1 << (row & 7)
+        return _bits(bitmap)
+
+    def with_app(self, app: str, min_area: int = 0, min_width: int = 0,
+                 min_height: int = 0) -> int:
+        """
+        Bitset of the device rows running app in a zone at least as large as
+        given.
+        """
+        if not (min_area or min_width or min_height):
+            return _bits(self._app_devices.get(app, b""))
+        zones = _bits(self._app_zones.get(app, b""))
+        if not zones:
+            return 0
+        return self.zone_devices(
+            self.zones_where(min_area, min_width, min_height, zones))
+
+    def where(self, vertical: bool = None, scroller: bool = None,
+              minizone: bool = None, overlapping: bool = None) -> int:
+        """
+        Bitset of the device rows matching every given setting.
+        """
+        bits = _bits(self._present)
+        for wanted, bitmap in ((vertical, self._vertical),
+                               (scroller, self._scroller),
+                               (minizone, self._minizone),
+                               (overlapping, self._overlapping)):
+            if wanted is not None:
+                column = _bits(bitmap)
+                bits &= column if wanted else ~column
+        return bits
+
+    def devices(self, bits: int) -> List[DeviceKey]:
+        """
+        (client_id, device_id) of every device row in bits.
+        """
+        bits &= _bits(self._present)
+        return [self.keys[row] for row in bit_indices(bits)]
+
+    def apps(self) -> List[str]:
+        return sorted(app for app, bitmap in self._app_devices.items()
+                      if any(bitmap))
+
+    @staticmethod
+    def count(bits: int) -> int:
+        return bin(bits).count("1")
@@ -0,0 +1,298 @@
+"""
+Precomputed play timelines for ads configs, so previews and proof-of-play
+reconciliation can look up what a device showed instead of re-simulating its
+rotation ad by ad.
+
+A device rotates through the ads active at the moment in index order, showing
+each of an ad's media in turn for the ad's playtime, or for an automatic
+duration when its playtime is 0 (RUNTIMEAUTO). The rotation restarts whenever
+the set of active ads changes.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from itertools import accumulate, islice
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Tuple
+from zoneinfo import ZoneInfo
+
+from .ads import AdsBaseConfig, AdsConfig
+from .fleet import run_bounded
+from .general import GeneralConfig
+from .schedule import (MINUTES_PER_DAY, AdSchedule, _set_bits,
+                       compile_timeframe)
+from .section import DEFAULT_BASE_PATH
+
+# seconds each media of an ad with a playtime of 0 (RUNTIMEAUTO) is shown for,
+# unless a media_duration function says otherwise
+AUTO_DURATION = 10
+
+
+def auto_duration(ad, media) -> int:
+    """
+    Default media_duration: AUTO_DURATION for every media.
+    """
+    # pylint: disable=unused-argument
+    return AUTO_DURATION
+
+
+class PlanSegment(NamedTuple):
+    """
+    Stretch of a Playlist during which the set of active ads is constant.
+    start and end are in seconds from the start of the playlist, and the
+    segment's entries are entries[first:first + count].
+    """
+    start: int
+    end: int
+    bits: int
+    first: int
+    count: int
+
+
+class Playlist:
+    """
+    Planned rotation of an ads config over whole days of device local time,
+    starting at local midnight. Entry i starts starts[i] seconds after start
+    and shows media media[i] of ad ads[i] (-1 for ads without media) for
+    durations[i] seconds.
+    """
+
+    __slots__ = ["start", "days", "starts", "durations", "ads", "media",
+                 "segments"]
+
+    def __init__(self, start: datetime, days: int):
+        self.start = start
+        self.days = days
+        self.starts = array("l")
+        self.durations = array("l")
+        self.ads = array("l")
+        self.media = array("l")
+        self.segments: List[PlanSegment] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def at(self, when: datetime) -> int:
+        """
+        Index of the entry playing at the aware datetime when, or -1 if
+        nothing is playing.
+        """
+        # timestamps, since subtracting datetimes sharing a tzinfo ignores
+        # DST changes in between
+        offset = int(when.timestamp() - self.start.timestamp())
+        i = bisect_right(self.starts, offset) - 1
+        if i < 0 or offset >= self.starts[i] + self.durations[i]:
+            return -1
+        return i
+
+    def entries(self) -> Iterator[Tuple[datetime, int, int, int]]:
+        """
+        Yield (start, duration, ad index, media index) for every entry, with
+        start in device local time.
+        """
+        zone = self.start.tzinfo
+        origin = self.start.astimezone(dt_timezone.utc)
+        for start, duration, ad, media in zip(self.starts, self.durations,
+                                              self.ads, self.media):
+            yield ((origin + timedelta(seconds=start)).astimezone(zone),
+                   duration, ad, media)
+
+    def play_seconds(self, ad_count: int) -> array:
+        """
+        Total seconds planned for each of ad_count ads.
+        """
+        totals = array("l", bytes(ad_count * array("l").itemsize))
+        for ad, duration in zip(self.ads, self.durations):
+            totals[ad] += duration
+        return totals
+
+
+def _zone(timezone: str) -> ZoneInfo:
+    if not timezone:
+        return ZoneInfo("UTC")
+    try:
+        return ZoneInfo(timezone)
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Unknown timezone {timezone!r}") from e
+
+
+def _segments(schedule: AdSchedule, origin: datetime,
+              days: int) -> List[Tuple[int, int, int]]:
+    """
+    (start, end, bits) of every stretch of constant active ads, in seconds
+    from origin, merging stretches that continue across midnight.
+    """
+    zone = origin.tzinfo
+    epoch = origin.timestamp()
+    boundaries = schedule.boundaries
+    segments = []
+    for n in range(days):
+        day = origin.date() + timedelta(days=n)
+        midnight = datetime.combine(day, time(), zone)
+        day_bits = schedule.date_bits(day)
+        base = (day.isoweekday() % 7) * MINUTES_PER_DAY
+        first = bisect_right(boundaries, base) - 1
+        last = bisect_left(boundaries, base + MINUTES_PER_DAY)
+        minutes = [base] + list(boundaries[first + 1:last]) \
+            + [base + MINUTES_PER_DAY]
+        # wall clock minutes to elapsed seconds, honouring DST changes
+        seconds = [int((midnight + timedelta(minutes=minute - base))
+                       .timestamp() - epoch) for minute in minutes]
+        # minutes skipped when the clock springs forward come out past the
+        # change, and all happen at the change itself
+        for i in range(len(seconds) - 2, -1, -1):
+            seconds[i] = min(seconds[i], seconds[i + 1])
+        for i in range(len(minutes) - 1):
+            start, end = seconds[i], seconds[i + 1]
+            if end <= start:
+                # skipped by a DST change
+                continue
+            bits = schedule.segments[first + i] & day_bits
+            if segments and segments[-1][2] == bits \
+                    and segments[-1][1] == start:
+                segments[-1] = (segments[-1][0], end, bits)
+            else:
+                segments.append((start, end, bits))
+    return segments
+
+
+def _cycle(ads: list, bits: int,
+           media_duration: Callable) -> Tuple[array, array, array]:
+    cycle_ads, cycle_media, cycle_durations = \
+        array("l"), array("l"), array("l")
+    for i in _set_bits(bits):
+        ad = ads[i]
+        for j, media in enumerate(ad.media or [None]):
+            cycle_ads.append(i)
+            cycle_media.append(j if media is not None else -1)
+            duration = int(ad.playtime) if ad.playtime else \
+                media_duration(ad, media)
+            cycle_durations.append(max(1, int(duration)))
+    return cycle_ads, cycle_media, cycle_durations
+
+
+def _fill(playlist: Playlist, start: int, end: int, cycle: tuple):
+    cycle_ads, cycle_media, cycle_durations = cycle
+    repeats, rest = divmod(end - start, sum(cycle_durations))
+    ads = cycle_ads * repeats
+    media = cycle_media * repeats
+    durations = cycle_durations * repeats
+    for ad, medium, duration in zip(*cycle):
+        if rest <= 0:
+            break
+        ads.append(ad)
+        media.append(medium)
+        durations.append(min(duration, rest))
+        rest -= duration
+    playlist.starts.extend(islice(accumulate(durations, initial=start),
+                                  len(durations)))
+    playlist.durations.extend(durations)
+    playlist.ads.extend(ads)
+    playlist.media.extend(media)
+
+
+def _build(config: AdsBaseConfig, origin: datetime, days: int,
+           media_duration: Callable, previous: Playlist = None,
+           changed: int = None) -> Playlist:
+    playlist = Playlist(origin, days)
+    reusable = {}
+    if previous is not None:
+        reusable = {(s.start, s.end, s.bits): s for s in previous.segments
+                    if not s.bits >> changed & 1}
+    cycles = {}
+    for start, end, bits in _segments(config.schedule, origin, days):
+        first = len(playlist.starts)
+        old = reusable.get((start, end, bits))
+        if old is not None:
+            span = slice(old.first, old.first + old.count)
+            playlist.starts.extend(previous.starts[span])
+            playlist.durations.extend(previous.durations[span])
+            playlist.ads.extend(previous.ads[span])
+            playlist.media.extend(previous.media[span])
+        elif bits:
+            cycle = cycles.get(bits)
+            if cycle is None:
+                cycle = cycles[bits] = _cycle(config.ads, bits,
+                                              media_duration)
+            _fill(playlist, start, end, cycle)
+        playlist.segments.append(PlanSegment(
+            start, end, bits, first, len(playlist.starts) - first))
+    return playlist
+
+
+def plan(config: AdsBaseConfig, timezone: str = None, start: date = None,
+         days: int = 1,
+         media_duration: Callable = auto_duration) -> Playlist:
+    """
+    Plan config's rotation for days whole days from start (today by
+    default) in the device's timezone, as found in GeneralConfig.timezone.
+    media_duration(ad, media) gives the seconds each media of an ad with a
+    playtime of 0 plays for; media is None for ads without media.
+    """
+    zone = _zone(timezone)
+    if start is None:
+        start = datetime.now(zone).date()
+    origin = datetime.combine(start, time(), zone)
+    return _build(config, origin, days, media_duration)
+
+
+def replan(playlist: Playlist, config: AdsBaseConfig, ad_index: int,
+           media_duration: Callable = auto_duration) -> Playlist:
+    """
+    Plan again after config.ads[ad_index] was changed in place, which also
+    updates config.schedule. Only the segments in which that ad was or now
+    is active are recomputed. Adding or removing ads needs a new plan().
+    """
+    ad = config.ads[ad_index]
+    schedule = config.schedule
+    masks = list(schedule.masks)
+    masks[ad_index] = compile_timeframe(ad.timeframe)
+    start_days = array("l", schedule.start_days)
+    start_days[ad_index] = ad.timeframe.start_day.toordinal()
+    end_days = array("l", schedule.end_days)
+    end_days[ad_index] = ad.timeframe.end_day.toordinal()
+    config.schedule = AdSchedule(masks, start_days, end_days)
+
+    # segments where the ad was active are missing from the new segments
+    # with their old bits, and so are never reused
+    return _build(config, playlist.start, playlist.days, media_duration,
+                  playlist, ad_index)
+
+
+class PlanResult(NamedTuple):
+    """
+    Outcome of planning one device. Exactly one of playlist and error is
+    set.
+    """
+    client_id: int
+    device_id: str
+    playlist: Playlist
+    error: Exception
+
+
+def _plan_device(client_id: int, device_id: str, section: type, start: date,
+                 days: int, base_path: str, cached: bool,
+                 media_duration: Callable) -> Playlist:
+    general = GeneralConfig.from_v6_id(client_id, device_id, base_path, cached)
+    config = section.from_v6_id(client_id, device_id, base_path, cached)
+    return plan(config, general.timezone, start, days, media_duration)
+
+
+def plan_many(client_device_pairs: Iterable[Tuple[int, str]], start: date,
+              days: int = 1, section: type = AdsConfig,
+              base_path: str = DEFAULT_BASE_PATH, max_workers: int = None,
+              processes: bool = True,
+              media_duration: Callable = auto_duration) \
+        -> Iterator[PlanResult]:
+    """
+    Plan section for every (client_id, device_id) pair in its own timezone,
+    on a process pool (or a thread pool when processes is False), yielding
+    results as they complete. media_duration must be a picklable top-level
+    function when using processes.
+    """
+    jobs = (((client_id, device_id), _plan_device,
+             (client_id, device_id, section, start, days, base_path,
+              not processes, media_duration))
+            for client_id, device_id in client_device_pairs)
+    for (client_id, device_id), playlist, error in \
+            run_bounded(jobs, max_workers, processes):
+        yield PlanResult(client_id, device_id, playlist, error)
@@ -0,0 +1,183 @@
+"""
+Compiled minute-of-week schedules for answering "which ads are active" queries
+without walking every Ad.Timeframe.
+"""
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+FULL_WEEK = (1 << MINUTES_PER_WEEK) - 1
+
+
+def minute_of_week(when: datetime) -> int:
+    """
+    Minute offset of when from Sunday 00:00, matching the ordering of
+    Ad.Timeframe.DaySchedule.Weekday.
+    """
+    return ((when.isoweekday() % 7) * MINUTES_PER_DAY
+            + when.hour * 60 + when.minute)
+
+
+def _span(start: int, end: int) -> int:
+    return ((1 << (end - start)) - 1) << start
+
+
+def _set_bits(bits: int) -> List[int]:
+    indices = []
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+def compile_timeframe(timeframe) -> int:
+    """
+    Compile an Ad.Timeframe's weekly schedule into a MINUTES_PER_WEEK-bit
+    mask, where bit n is set when the ad plays during minute n of the week.
+    A runtime whose end is not after its start runs past midnight into the
+    next day, and a day with no runtimes does not play at all.
+    """
+    mask = 0
+    for day_schedule in timeframe.schedule:
+        base = (day_schedule.weekday.value - 1) * MINUTES_PER_DAY
+        for runtime in day_schedule.runtimes:
+            start = base + runtime.start[0] * 60 + runtime.start[1]
+            end = base + runtime.end[0] * 60 + runtime.end[1]
+            if end <= start:
+                end += MINUTES_PER_DAY
+            mask |= _span(start, end)
+    # Saturday runtimes past midnight wrap around to Sunday
+    return (mask & FULL_WEEK) | (mask >> MINUTES_PER_WEEK)
+
+
+class AdSchedule:
+    """
+    Array-backed schedule for every ad of an AdsBaseConfig. Each ad has a
+    minute-of-week mask and inclusive start/end date bounds (as ordinals).
+    The week is also split into segments during which the set of scheduled
+    ads doesn't change, stored as ad bitsets, so that lookups are a bisect
+    and a couple of integer ANDs regardless of how many ads there are.
+    """
+
+    __slots__ = ["masks", "start_days", "end_days", "boundaries", "segments",
+                 "_date_bits"]
+
+    def __init__(self, masks: List[int], start_days: Iterable[int],
+                 end_days: Iterable[int]):
+        self.masks = masks
+        self.start_days = array("l", start_days)
+        self.end_days = array("l", end_days)
+
+        # minutes at which any ad switches on or off, always starting at 0
+        changes = 0
+        for mask in masks:
+            rotated = ((mask << 1) | (mask >> (MINUTES_PER_WEEK - 1))) \
+                & FULL_WEEK
+            changes |= mask ^ rotated
+        self.boundaries = array("H", sorted(set(_set_bits(changes)) | {0}))
+        self.segments = [
+            sum(1 << i for i, mask in enumerate(masks) if mask >> start & 1)
+            for start in self.boundaries]
+        self._date_bits = {}
+
+    @classmethod
+    def from_ads(cls, ads: list) -> 'AdSchedule':
+        return cls([compile_timeframe(ad.timeframe) for ad in ads],
+                   [ad.timeframe.start_day.toordinal() for ad in ads],
+                   [ad.timeframe.end_day.toordinal() for ad in ads])
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def date_bits(self, day: date) -> int:
+        """
+        Bitset of the ads whose date bounds include day.
+        """
+        ordinal = day.toordinal()
+        bits = self._date_bits.get(ordinal)
+        if bits is None:
+            bits = 0
+            for i, (start, end) in enumerate(zip(self.start_days,
+                                                 self.end_days)):
+                if start <= ordinal <= end:
+                    bits |= 1 << i
+            if len(self._date_bits) > 64:
+                self._date_bits.clear()
+            self._date_bits[ordinal] = bits
+        return bits
+
+    def active_bits(self, when: datetime) -> int:
+        """
+        Bitset of the ads active at when.
+        """
+        segment = bisect_right(self.boundaries, minute_of_week(when)) - 1
+        return self.segments[segment] & self.date_bits(when)
+
+    def active_at(self, when: datetime) -> List[int]:
+        """
+        Indices of the ads active at when.
+        """
+        return _set_bits(self.active_bits(when))
+
+    def _next_boundary(self, when: datetime) -> datetime:
+        when = when.replace(second=0, microsecond=0)
+        minute = minute_of_week(when)
+        segment = bisect_right(self.boundaries, minute)
+        if segment < len(self.boundaries):
+            next_minute = self.boundaries[segment]
+        else:
+            next_minute = MINUTES_PER_WEEK
+        midnight = datetime.combine(when.date() + timedelta(days=1),
+                                    datetime.min.time(), when.tzinfo)
+        return min(when + timedelta(minutes=next_minute - minute), midnight)
+
+    def active_between(self, start: datetime, end: datetime) -> List[int]:
+        """
+        Indices of the ads active at any point in [start, end).
+        """
+        everything = (1 << len(self.masks)) - 1
+        bits = 0
+        when = start
+        while when < end and bits != everything:
+            bits |= self.active_bits(when)
+            when = self._next_boundary(when)
+        return _set_bits(bits)
+
+    def next_change(self, when: datetime) -> Optional[datetime]:
+        """
+        First minute after when at which the set of active ads differs from
+        the set active at when, or None if it never changes again.
+        """
+        if not self.masks:
+            return None
+        current = self.active_bits(when)
+        first_day = min(self.start_days)
+        last_day = max(self.end_days)
+        while True:
+            when = self._next_boundary(when)
+            if when.toordinal() < first_day:
+                # nothing can be active before the earliest start date
+                when = datetime.combine(date.fromordinal(first_day),
+                                        datetime.min.time(), when.tzinfo)
+            if self.active_bits(when) != current:
+                return when
+            if when.toordinal() > last_day:
+                return None
+
+
+def active_at_many(schedules: Iterable[AdSchedule],
+                   when: datetime) -> List[List[int]]:
+    """
+    Evaluate active_at for many devices' schedules at the same instant.
+    """
+    minute = minute_of_week(when)
+    results = []
+    for schedule in schedules:
+        segment = bisect_right(schedule.boundaries, minute) - 1
+        results.append(_set_bits(schedule.segments[segment]
+                                 & schedule.date_bits(when)))
+    return results
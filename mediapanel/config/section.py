@@ -2,6 +2,11 @@
 Class modules for mediaPanel configuration types.
 """
 import json
+from collections import OrderedDict
+from os import listdir, stat
+from os.path import basename, dirname
+from threading import Lock
+from typing import Collection, NamedTuple
 
 
 class ConfigSection:
@@ -50,6 +55,114 @@ class ConfigSectionJSONEncoder(json.JSONEncoder):
 JSON_ENCODER = ConfigSectionJSONEncoder()
 
 
+class ConfigCache:
+    """
+    Process-wide LRU cache of parsed Config objects, keyed on the config class
+    and the file path. Entries are validated against the file's
+    (mtime_ns, size, inode) on every lookup, so an external write to the file
+    is picked up on the next load.
+
+    Cached objects are shared between every caller loading the same file.
+    """
+
+    __slots__ = ["maxsize", "hits", "misses", "evictions", "_entries",
+                 "_paths", "_lock"]
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # path -> set of config classes cached for that path
+        self._paths = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def signature(path: str) -> tuple:
+        info = stat(path)
+        return info.st_mtime_ns, info.st_size, info.st_ino
+
+    def get(self, cls: type, path: str, signature: tuple = None):
+        """
+        Return the cached object for (cls, path), or None if there is no
+        entry or the file changed since it was cached.
+        """
+        key = (cls, path)
+        if signature is None:
+            signature = self.signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, cls: type, path: str, obj, signature: tuple):
+        """
+        Store obj for (cls, path), evicting the least recently used entries
+        when the cache is full.
+        """
+        if self.maxsize <= 0:
+            return
+        key = (cls, path)
+        with self._lock:
+            self._entries[key] = (signature, obj)
+            self._entries.move_to_end(key)
+            self._paths.setdefault(path, set()).add(cls)
+            while len(self._entries) > self.maxsize:
+                (old_cls, old_path), _ = self._entries.popitem(last=False)
+                self._discard_path(old_cls, old_path)
+                self.evictions += 1
+
+    def _discard_path(self, cls: type, path: str):
+        classes = self._paths.get(path)
+        if classes is not None:
+            classes.discard(cls)
+            if not classes:
+                del self._paths[path]
+
+    def invalidate(self, path: str):
+        """
+        Drop every entry for path, regardless of config class.
+        """
+        with self._lock:
+            for cls in self._paths.pop(path, ()):
+                self._entries.pop((cls, path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+CONFIG_CACHE = ConfigCache()
+
+DEFAULT_BASE_PATH = "/var/www/html/mediapanel/device_config/"
+
+
+class SaveResult(NamedTuple):
+    """
+    Outcome of Config.save_v6(). Unchanged content is not rewritten and is
+    counted in bytes_skipped instead of bytes_written.
+    """
+    path: str
+    written: bool
+    bytes_written: int
+    bytes_skipped: int
+
+
 class Config(ConfigSection):
     """
     Base class for all Config objects.
@@ -61,35 +174,110 @@ class Config(ConfigSection):
     file_path = ""
 
     @classmethod
-    def from_v6_file(cls, filename: str):
+    def from_v6_file(cls, filename: str, cached: bool = False,
+                     interned: bool = False, read_only: bool = False):
         """
         Load a mediaPanel v6 JSON file (from the ColdFusion servers) and create
         a GeneralConfig.
+
+        When cached is True, the parsed object is served from and stored in
+        CONFIG_CACHE, and is therefore shared with other callers; only use it
+        for configs that are not modified.
+
+        When interned is True, files with identical content are parsed once
+        through INTERNER; see mediapanel.config.intern. Each call gets its own
+        copy of the parsed config, unless read_only is True: then it shares
+        one object graph with every other read only load of the same content,
+        and must not be modified. Interned loads bypass CONFIG_CACHE, so plain
+        loads never get a shared graph.
         """
-        with open(filename) as json_file:
-            data = cls.from_v6_values(json.load(json_file))
-            # this *does* require a "redundant" keyword arg because of the
-            # super().__init__() call.
-            # pylint: disable=redundant-keyword-arg
-            obj = cls(data, v6_path=filename)
-            return obj
+        if interned:
+            # pylint: disable=import-outside-toplevel
+            from .intern import INTERNER, edit
+            with open(filename, "rb") as json_file:
+                content = json_file.read()
+            obj = INTERNER.intern(cls, filename, content, cls.from_v6_bytes)
+            return obj if read_only else edit(obj)
+        if cached:
+            signature = CONFIG_CACHE.signature(filename)
+            obj = CONFIG_CACHE.get(cls, filename, signature)
+            if obj is not None:
+                return obj
+        with open(filename, "rb") as json_file:
+            obj = cls.from_v6_bytes(json_file.read(), filename)
+        if cached:
+            CONFIG_CACHE.put(cls, filename, obj, signature)
+        return obj
+
+    @classmethod
+    def from_v6_bytes(cls, content: bytes, filename: str = None):
+        """
+        Create a config from the content of a mediaPanel v6 JSON file.
+        """
+        # imported on first use, since the codec's JSON libraries and their
+        # dependencies add up to most of the import time of this module
+        # pylint: disable=import-outside-toplevel
+        from ..codec import loads
+        data = cls.from_v6_values(loads(content))
+        # this *does* require a "redundant" keyword arg because of the
+        # super().__init__() call.
+        # pylint: disable=redundant-keyword-arg
+        return cls(data, v6_path=filename)
 
     @classmethod
     def from_v6_id(cls, client_id: str, device_id: str,
-                   base_path: str = "/var/www/html/mediapanel/device_config/"):
+                   base_path: str = DEFAULT_BASE_PATH, cached: bool = False,
+                   interned: bool = False, read_only: bool = False):
         """
         Load a mediaPanel v6 JSON file when given a client_id and device_id.
         """
-        path = f"{base_path}/{client_id}/1/{device_id}/{cls.file_path}"
-        return cls.from_v6_file(path)
+        return cls.from_v6_file(cls.v6_path(client_id, device_id, base_path),
+                                cached, interned, read_only)
+
+    @classmethod
+    def v6_path(cls, client_id: str, device_id: str,
+                base_path: str = DEFAULT_BASE_PATH,
+                listing: Collection[str] = None) -> str:
+        """
+        Path of the mediaPanel v6 JSON file for a client_id and device_id.
+
+        When file_path is a list of fallbacks sharing a directory, the first
+        one present in that directory is used, found with a single listing of
+        it (or in listing, if the caller already listed it). The last
+        fallback is used if none of them exist.
+        """
+        if base_path is None:
+            base_path = DEFAULT_BASE_PATH
+        device_path = f"{base_path}/{client_id}/1/{device_id}"
+        if isinstance(cls.file_path, str):
+            return f"{device_path}/{cls.file_path}"
+        if listing is None:
+            try:
+                listing = listdir(f"{device_path}/{dirname(cls.file_path[0])}")
+            except (FileNotFoundError, NotADirectoryError):
+                listing = ()
+        listing = set(listing)
+        for candidate in cls.file_path:
+            if basename(candidate) in listing:
+                return f"{device_path}/{candidate}"
+        return f"{device_path}/{cls.file_path[-1]}"
 
-    def save_v6(self):
+    def save_v6(self, fsync: bool = False, force: bool = False) \
+            -> SaveResult:
         """
-        Save the JSON-serialized v6 version to a file.
+        Save the JSON-serialized v6 version to a file. The file is replaced
+        atomically, and left untouched if it already holds the same content
+        unless force is True.
         """
-        with open(self.path, "w") as v6_file:
-            for item in self.json(True):
-                v6_file.write(item)
+        # pylint: disable=import-outside-toplevel
+        from ..codec import dumps_v6
+        from ..files import atomic_write, same_content
+        content = dumps_v6(self)
+        if not force and same_content(self.path, content):
+            return SaveResult(self.path, False, 0, len(content))
+        atomic_write(self.path, content, fsync)
+        CONFIG_CACHE.invalidate(self.path)
+        return SaveResult(self.path, True, len(content), 0)
 
     def __init__(self, v6_path: str = None):
         if v6_path is not None:
@@ -0,0 +1,227 @@
+"""
+Binary snapshots of parsed configs, so that workers can start without
+re-parsing every v6 JSON file.
+
+A snapshot holds the already-converted Config objects for every device of one
+client, each pickled separately behind a small header, together with the
+(mtime_ns, size, inode) and SHA-256 of the JSON file it was built from. Opening
+a snapshot only reads the header; configs are unpickled on first use, and an
+entry whose source file has changed since the snapshot was built is ignored.
+
+Snapshots are rebuilt offline:
+
+    python -m mediapanel.config.snapshot SNAPSHOT_DIR [CLIENT_ID ...]
+"""
+import argparse
+import hashlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from os import fstat, listdir
+from os.path import isdir, join
+from struct import Struct
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from ..codec import loads
+from ..files import atomic_write
+from .ads import AdsConfig, AdsHorizontalConfig, AdsVerticalConfig
+from .events import EventsConfig
+from .general import GeneralConfig
+from .layout import LayoutConfig
+from .section import CONFIG_CACHE, DEFAULT_BASE_PATH, Config
+
+MAGIC = b"MPSNAP1\n"
+_HEADER_SIZE = Struct("<Q")
+
+SECTIONS = (GeneralConfig, LayoutConfig, EventsConfig, AdsConfig,
+            AdsVerticalConfig, AdsHorizontalConfig)
+
+
+def _section_name(section: type) -> str:
+    return f"{section.__module__}.{section.__qualname__}"
+
+
+_SECTIONS_BY_NAME = {_section_name(section): section for section in SECTIONS}
+
+
+def snapshot_path(snapshot_dir: str, client_id: int) -> str:
+    return join(snapshot_dir, f"{client_id}.snapshot")
+
+
+def build_snapshot(client_id: int, snapshot_dir: str,
+                   base_path: str = DEFAULT_BASE_PATH,
+                   device_ids: Iterable[str] = None,
+                   sections: Sequence[type] = SECTIONS) -> int:
+    """
+    Parse every section of every device of client_id (all devices found
+    under base_path by default) and write them to the client's snapshot.
+    Sections whose source file is missing or invalid are left out. Returns
+    the number of configs stored.
+    """
+    if device_ids is None:
+        client_path = join(base_path, str(client_id), "1")
+        device_ids = sorted(d for d in listdir(client_path)
+                            if isdir(join(client_path, d)))
+
+    header = {}
+    blobs = []
+    offset = 0
+    for device_id in device_ids:
+        for section in sections:
+            path = section.v6_path(client_id, device_id, base_path)
+            try:
+                with open(path, "rb") as source:
+                    # the signature of the file actually read, taken first
+                    # so that a write during the read makes it stale
+                    info = fstat(source.fileno())
+                    raw = source.read()
+                config = section(section.from_v6_values(loads(raw)),
+                                 v6_path=path)
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            blob = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+            header[(device_id, _section_name(section))] = (
+                path, (info.st_mtime_ns, info.st_size, info.st_ino),
+                hashlib.sha256(raw).hexdigest(), offset, len(blob))
+            blobs.append(blob)
+            offset += len(blob)
+
+    header_blob = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+    atomic_write(snapshot_path(snapshot_dir, client_id),
+                 b"".join([MAGIC, _HEADER_SIZE.pack(len(header_blob)),
+                           header_blob] + blobs))
+    return len(header)
+
+
+class Snapshot:
+    """
+    Lazily loaded snapshot of one client's configs.
+    """
+
+    __slots__ = ["path", "header", "_data_offset", "_loaded"]
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a config snapshot")
+            size, = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            self.header = pickle.loads(f.read(size))
+        self._data_offset = len(MAGIC) + _HEADER_SIZE.size + size
+        self._loaded = {}
+
+    def __len__(self) -> int:
+        return len(self.header)
+
+    def get(self, device_id: str, section: type,
+            verify_hash: bool = False) -> Optional[Config]:
+        """
+        Return the snapshotted config, or None if it isn't in the snapshot
+        or its source file changed since. With verify_hash, the source
+        file's content is hashed as well, rather than trusting its stat.
+        """
+        key = (device_id, _section_name(section))
+        entry = self.header.get(key)
+        if entry is None:
+            return None
+        path, signature, digest, offset, length = entry
+        try:
+            if CONFIG_CACHE.signature(path) != signature:
+                return None
+            if verify_hash:
+                with open(path, "rb") as source:
+                    if hashlib.sha256(source.read()).hexdigest() != digest:
+                        return None
+        except OSError:
+            return None
+
+        config = self._loaded.get(key)
+        if config is None:
+            with open(self.path, "rb") as f:
+                f.seek(self._data_offset + offset)
+                config = pickle.loads(f.read(length))
+            self._loaded[key] = config
+        return config
+
+
+class SnapshotStore:
+    """
+    Serve configs from per-client snapshots in snapshot_dir, falling back to
+    parsing the v6 file when there is no fresh snapshot entry. Loaded configs
+    are added to CONFIG_CACHE either way.
+    """
+
+    __slots__ = ["snapshot_dir", "base_path", "_snapshots"]
+
+    def __init__(self, snapshot_dir: str,
+                 base_path: str = DEFAULT_BASE_PATH):
+        self.snapshot_dir = snapshot_dir
+        self.base_path = base_path
+        self._snapshots: Dict[int, Optional[Snapshot]] = {}
+
+    def snapshot(self, client_id: int) -> Optional[Snapshot]:
+        if client_id not in self._snapshots:
+            try:
+                self._snapshots[client_id] = Snapshot(
+                    snapshot_path(self.snapshot_dir, client_id))
+            except (OSError, ValueError):
+                self._snapshots[client_id] = None
+        return self._snapshots[client_id]
+
+    def load(self, section: type, client_id: int, device_id: str) -> Config:
+        snapshot = self.snapshot(client_id)
+        config = snapshot.get(device_id, section) \
+            if snapshot is not None else None
+        if config is None:
+            return section.from_v6_id(client_id, device_id, self.base_path,
+                                      cached=True)
+        CONFIG_CACHE.put(section, config.path, config,
+                         snapshot.header[(device_id,
+                                          _section_name(section))][1])
+        return config
+
+    def warm(self, client_ids: Iterable[int]) -> int:
+        """
+        Load every fresh config of the given clients' snapshots into
+        CONFIG_CACHE. Returns the number of configs loaded.
+        """
+        loaded = 0
+        for client_id in client_ids:
+            snapshot = self.snapshot(client_id)
+            if snapshot is None:
+                continue
+            for device_id, name in list(snapshot.header):
+                section = _SECTIONS_BY_NAME.get(name)
+                if section is None:
+                    continue
+                config = snapshot.get(device_id, section)
+                if config is not None:
+                    CONFIG_CACHE.put(section, config.path, config,
+                                     snapshot.header[(device_id, name)][1])
+                    loaded += 1
+        return loaded
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        description="Rebuild config snapshots for one or more clients.")
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("client_ids", nargs="*",
+                        help="clients to rebuild (default: every client)")
+    parser.add_argument("--base-path", default=DEFAULT_BASE_PATH)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    client_ids = args.client_ids or sorted(
+        c for c in listdir(args.base_path)
+        if c.isdigit() and isdir(join(args.base_path, c, "1")))
+    with ProcessPoolExecutor(args.jobs) as executor:
+        futures = {client_id: executor.submit(build_snapshot, client_id,
+                                              args.snapshot_dir,
+                                              args.base_path)
+                   for client_id in client_ids}
+        for client_id, future in futures.items():
+            print(f"{client_id}: {future.result()} configs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Work queue API on top of the mediaConvertQueue table, for media converter
+workers.
+
+Jobs move from QUEUED to CONVERTING when claimed, and to CONVERTED or FAILED
+when finished. While a job is CONVERTING, convertTimestamp holds the time it
+was claimed, so jobs whose worker died can be found and re-queued once their
+lease expires; workers renew the lease of jobs they are still converting with
+extend(). Re-queued jobs keep it, and every claim or renewal of a job gets a
+later time than the one before. Finishing a job requires convertTimestamp to
+still hold the time it was claimed at, so a worker whose lease expired cannot
+finish a job that another worker claimed again. Once finished, it holds the
+completion time.
+"""
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from os import cpu_count
+from threading import Event
+from time import monotonic
+from typing import Callable, Iterable, List, NamedTuple
+
+from sqlalchemy.orm import Session
+
+from .db import MediaConvertQueue
+
+# dialects supporting SELECT ... FOR UPDATE SKIP LOCKED
+SKIP_LOCKED_DIALECTS = {"mysql", "mariadb", "postgresql", "oracle"}
+
+
+class ConvertJob(NamedTuple):
+    """
+    Plain copy of a claimed queue row, safe to send to worker processes.
+    claimed_at is the row's convertTimestamp when it was claimed.
+    """
+    id: int
+    client_id: int
+    device_id: str
+    group_id: int
+    filename: str
+    filepath: str
+    mode: str
+    is_digital_frame: bool
+    is_display_ad: bool
+    is_alerts: bool
+    is_jukebox: bool
+    claimed_at: datetime
+
+    @classmethod
+    def from_row(cls, row: MediaConvertQueue) -> 'ConvertJob':
+        return cls(*(getattr(row, field) for field in cls._fields[:-1]),
+                   row.convert_timestamp)
+
+
+def _claim_time(now: datetime, previous: datetime) -> datetime:
+    """
+    Time to claim a job at, later than the time it was last claimed at.
+    """
+    if previous is None or previous < now:
+        return now
+    return previous + timedelta(seconds=1)
+
+
+class ConvertQueue:
+    """
+    Claim, complete and re-queue mediaConvertQueue jobs. session_factory is
+    any callable returning a new Session, such as a SessionFactory or a
+    sessionmaker.
+    """
+
+    QUEUED = "queued"
+    CONVERTING = "converting"
+    CONVERTED = "converted"
+    FAILED = "failed"
+
+    __slots__ = ["session_factory", "lease"]
+
+    def __init__(self, session_factory: Callable[[], Session],
+                 lease: timedelta = timedelta(minutes=30)):
+        self.session_factory = session_factory
+        self.lease = lease
+
+    @contextmanager
+    def _session(self):
+        session = self.session_factory()
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def claim(self, limit: int = 10) -> List[ConvertJob]:
+        """
+        Atomically claim up to limit queued jobs, oldest first. Rows locked
+        by other workers are skipped on databases supporting SKIP LOCKED;
+        elsewhere each row is claimed with a compare-and-swap on its status.
+        """
+        # whole seconds, since TIMESTAMP columns may not store fractions and
+        # claimed_at must compare equal to the stored value
+        now = datetime.now().replace(microsecond=0)
+        with self._session() as session:
+            queued = session.query(MediaConvertQueue)\
+                .filter(MediaConvertQueue.status == self.QUEUED)\
+                .order_by(MediaConvertQueue.id)
+            if session.get_bind().dialect.name in SKIP_LOCKED_DIALECTS:
+                rows = queued.limit(limit)\
+                    .with_for_update(skip_locked=True).all()
+                for row in rows:
+                    row.status = self.CONVERTING
+                    row.convert_timestamp = _claim_time(
+                        now, row.convert_timestamp)
+                return [ConvertJob.from_row(row) for row in rows]
+
+            # over-fetch candidates since other workers may win some of them
+            candidates = queued\
+                .with_entities(MediaConvertQueue.id,
+                               MediaConvertQueue.convert_timestamp)\
+                .limit(limit * 2).all()
+            claimed = []
+            for row_id, previous in candidates:
+                updated = session.query(MediaConvertQueue)\
+                    .filter(MediaConvertQueue.id == row_id,
+                            MediaConvertQueue.status == self.QUEUED)\
+                    .update({MediaConvertQueue.status: self.CONVERTING,
+                             MediaConvertQueue.convert_timestamp:
+                                 _claim_time(now, previous)},
+                            synchronize_session=False)
+                if updated:
+                    claimed.append(row_id)
+                    if len(claimed) == limit:
+                        break
+            if not claimed:
+                return []
+            rows = session.query(MediaConvertQueue)\
+                .filter(MediaConvertQueue.id.in_(claimed))\
+                .order_by(MediaConvertQueue.id)
+            return [ConvertJob.from_row(row) for row in rows]
+
+    def _finish(self, jobs: Iterable[ConvertJob], status: str) -> int:
+        # jobs claimed together mostly share their claim time
+        by_claim = defaultdict(list)
+        for job in jobs:
+            by_claim[job.claimed_at].append(job.id)
+        if not by_claim:
+            return 0
+        updated = 0
+        now = datetime.now()
+        with self._session() as session:
+            for claimed_at, job_ids in by_claim.items():
+                updated += session.query(MediaConvertQueue)\
+                    .filter(MediaConvertQueue.id.in_(job_ids),
+                            MediaConvertQueue.status == self.CONVERTING,
+                            MediaConvertQueue.convert_timestamp == claimed_at)\
+                    .update({MediaConvertQueue.status: status,
+                             MediaConvertQueue.convert_timestamp: now},
+                            synchronize_session=False)
+        return updated
+
+    def complete(self, jobs: Iterable[ConvertJob]) -> int:
+        """
+        Mark claimed jobs as converted, setting convertTimestamp. Jobs that
+        were re-queued or claimed again in the meantime are left alone.
+        Returns the number of jobs updated.
+        """
+        return self._finish(jobs, self.CONVERTED)
+
+    def fail(self, jobs: Iterable[ConvertJob]) -> int:
+        return self._finish(jobs, self.FAILED)
+
+    def extend(self, jobs: Iterable[ConvertJob]) -> List[ConvertJob]:
+        """
+        Renew the lease of claimed jobs that are still being converted, by
+        claiming them again. Returns the renewed jobs with their new
+        claimed_at; jobs that were re-queued or claimed again in the meantime
+        are left out.
+        """
+        now = datetime.now().replace(microsecond=0)
+        renewed = []
+        with self._session() as session:
+            # one row at a time, since a bulk UPDATE can't tell which rows
+            # it renewed
+            for job in jobs:
+                claimed_at = _claim_time(now, job.claimed_at)
+                if session.query(MediaConvertQueue)\
+                        .filter(MediaConvertQueue.id == job.id,
+                                MediaConvertQueue.status == self.CONVERTING,
+                                MediaConvertQueue.convert_timestamp
+                                == job.claimed_at)\
+                        .update({MediaConvertQueue.convert_timestamp:
+                                 claimed_at},
+                                synchronize_session=False):
+                    renewed.append(job._replace(claimed_at=claimed_at))
+        return renewed
+
+    def requeue_expired(self) -> int:
+        """
+        Put jobs claimed longer than the lease ago back in the queue, keeping
+        their claim time. Returns the number of jobs re-queued.
+        """
+        expired = datetime.now() - self.lease
+        with self._session() as session:
+            return session.query(MediaConvertQueue)\
+                .filter(MediaConvertQueue.status == self.CONVERTING,
+                        MediaConvertQueue.convert_timestamp < expired)\
+                .update({MediaConvertQueue.status: self.QUEUED},
+                        synchronize_session=False)
+
+
+def _renew(queue: ConvertQueue, in_flight: dict):
+    futures = {job.id: future for future, job in in_flight.items()}
+    for job in queue.extend(in_flight.values()):
+        in_flight[futures[job.id]] = job
+
+
+def run_workers(queue: ConvertQueue, convert: Callable[[ConvertJob], None],
+                processes: int = None, poll_interval: float = 5.0,
+                stop: Event = None, once: bool = False) -> int:
+    """
+    Drive convert over queued jobs with a local process pool, keeping every
+    process busy by claiming jobs in batches. convert must be a picklable
+    top-level function; a job is completed if it returns and failed if it
+    raises. Runs until stop is set, or until the queue is empty when once is
+    True. The lease of jobs in flight is renewed every third of the queue's
+    lease, so conversions may run longer than the lease as long as this
+    process is alive. Returns the number of jobs processed.
+    """
+    processes = processes or cpu_count() or 1
+    capacity = processes * 2
+    stop = stop or Event()
+    heartbeat = queue.lease.total_seconds() / 3
+    renewed_at = monotonic()
+    processed = 0
+    with ProcessPoolExecutor(processes) as executor:
+        in_flight = {}
+        while not stop.is_set():
+            if len(in_flight) < capacity:
+                queue.requeue_expired()
+                for job in queue.claim(capacity - len(in_flight)):
+                    in_flight[executor.submit(convert, job)] = job
+            if not in_flight:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+
+            if monotonic() - renewed_at >= heartbeat:
+                _renew(queue, in_flight)
+                renewed_at = monotonic()
+            done, _ = wait(in_flight, timeout=min(poll_interval, heartbeat),
+                           return_when=FIRST_COMPLETED)
+            succeeded, failed = [], []
+            for future in done:
+                job = in_flight.pop(future)
+                if future.exception() is None:
+                    succeeded.append(job)
+                else:
+                    failed.append(job)
+            queue.complete(succeeded)
+            queue.fail(failed)
+            processed += len(done)
+
+        # let claimed jobs finish so they aren't left waiting for a lease
+        while wait(in_flight, timeout=heartbeat).not_done:
+            _renew(queue, in_flight)
+        done = list(in_flight.items())
+        queue.complete([job for future, job in done
+                        if future.exception() is None])
+        queue.fail([job for future, job in done
+                    if future.exception() is not None])
+        processed += len(done)
+    return processed
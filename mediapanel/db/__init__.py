@@ -1,13 +1,51 @@
 # pylint: disable-all
 # flake8: noqa
+"""
+SQLAlchemy models and database helpers for mediaPanel.
 
-from .base import Base
-from .device import Device
+Nothing (including SQLAlchemy itself) is imported until one of the names
+below is first accessed. Accessing any model imports all of them, since the
+models refer to each other by name in their relationships.
+"""
+from importlib import import_module
 
-from .group import Group
-from .user import User
-from .client import Client
+_MODELS = {
+    "Base": ".base",
+    "Device": ".device",
+    "Group": ".group",
+    "User": ".user",
+    "Client": ".client",
+    "Asset": ".asset",
+    "MediaConvertQueue": ".media_convert_queue",
+}
 
-from .asset import Asset
+_EXPORTS = dict(_MODELS, **{
+    "PoolMetrics": ".session",
+    "SessionFactory": ".session",
+    "make_engine": ".session",
+    "QueryProfiler": ".instrumentation",
+    "assets_for_device": ".queries",
+    "device_staleness": ".queries",
+    "StalenessReport": ".queries",
+})
 
-from .media_convert_queue import MediaConvertQueue
+__all__ = list(_EXPORTS)
+
+
+def _load_models():
+    for module in _MODELS.values():
+        import_module(module, __name__)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    _load_models()
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
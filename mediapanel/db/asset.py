@@ -1,6 +1,6 @@
 # pylint: disable=missing-docstring
 from sqlalchemy import (Column, Integer, Boolean, String, Float, TIMESTAMP,
-                        ForeignKey)
+                        ForeignKey, Index)
 
 import sqlalchemy.sql.functions as func
 
@@ -9,6 +9,13 @@ from .base import Base
 
 class Asset(Base):  # pylint: disable=too-few-public-methods,missing-docstring
     __tablename__ = "userAssets"
+    __table_args__ = (
+        # device content syncs: direct device assets, then group assets
+        Index("ix_userAssets_deviceID", "deviceID"),
+        Index("ix_userAssets_groupID", "groupID"),
+        # per-client asset listings, optionally narrowed to a group
+        Index("ix_userAssets_clientId_groupID", "clientId", "groupID"),
+    )
     id = Column(Integer, primary_key=True)
     client_id = Column("clientId", Integer, nullable=False)
     device_id = Column("deviceID", String(45), ForeignKey("devices.deviceID"),
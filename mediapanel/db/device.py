@@ -1,5 +1,7 @@
 # pylint: disable=missing-docstring
-from sqlalchemy import Column, Integer, Boolean, String, TIMESTAMP
+from sqlalchemy import (Column, Index, Integer, Boolean, String, Numeric,
+                        TIMESTAMP, case, cast, func)
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 from sqlalchemy.types import TypeDecorator
@@ -7,39 +9,59 @@ from sqlalchemy.types import TypeDecorator
 from .base import Base
 
 
+# size suffixes and the power of 1024 they stand for
+SIZE_EXPONENTS = {"B": 0, "K": 1, "M": 2, "G": 3, "T": 4}
+
+
 class HumanReadableSize(TypeDecorator):
     """Converts a Human-Readable size to an Integer count of bytes"""
 
     impl = String
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if value is not None:
-            if value // 1024 ** 0 < 1024:
-                return str(value)
-            elif value // 1024 ** 1 < 1024:
-                return str(value) + "K"
-            elif value // 1024 ** 2 < 1024:
-                return str(value) + "M"
-            elif value // 1024 ** 3 < 1024:
-                return str(value) + "G"
+            for suffix in ("T", "G", "M", "K"):
+                unit = 1024 ** SIZE_EXPONENTS[suffix]
+                if value >= unit:
+                    return f"{round(value / unit, 1):g}{suffix}"
+            return str(value)
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            base_size = value[:-1]
-            size_char = value[-1:]
-            exponent = 0
-            if size_char == "K":
-                exponent = 1
-            elif size_char == "M":
-                exponent = 2
-            elif size_char == "G":
-                exponent = 3
-            return int(float(base_size) * (1024 ** exponent))
+            size_char = value[-1:].upper()
+            if size_char.isdigit():  # plain byte count without a suffix
+                return int(float(value))
+            if size_char in SIZE_EXPONENTS:
+                return int(float(value[:-1])
+                           * (1024 ** SIZE_EXPONENTS[size_char]))
+            # unknown suffix, counted as 0 like size_bytes() does
         return 0
 
 
+def size_bytes(column):
+    """
+    SQL expression evaluating a HumanReadableSize column to a byte count in
+    the database, mirroring HumanReadableSize.process_result_value.
+    """
+    suffix = func.upper(func.substr(column, -1))
+    number = cast(func.substr(column, 1, func.length(column) - 1),
+                  Numeric(20, 3))
+    return func.coalesce(case(
+        *((suffix == char, number * 1024 ** exponent)
+          for char, exponent in SIZE_EXPONENTS.items()),
+        (suffix.between("0", "9"), cast(column, Numeric(20, 3))),
+        else_=0), 0)
+
+
 class Device(Base):  # pylint: disable=too-few-public-methods,missing-docstring
     __tablename__ = "devices"
+    __table_args__ = (
+        # fleet status pages: staleness buckets, fleet-wide and per client
+        Index("ix_devices_lastCheckInTime", "lastCheckInTime"),
+        Index("ix_devices_clientID_lastCheckInTime", "clientID",
+              "lastCheckInTime"),
+    )
     device_id = Column("deviceID", String(45), primary_key=True)
     client_id = Column("clientID", Integer, nullable=False)
 
@@ -73,3 +95,21 @@ class Device(Base):  # pylint: disable=too-few-public-methods,missing-docstring
 
     total_disk = Column("bootTotalDiskSize", HumanReadableSize)
     free_disk = Column("bootFreeDiskAmount", HumanReadableSize)
+
+    # byte counts usable in SQL filters, sorts and aggregates, e.g.
+    # query(Device).filter(Device.free_disk_bytes < 1024 ** 3)
+    @hybrid_property
+    def total_disk_bytes(self):
+        return self.total_disk
+
+    @total_disk_bytes.expression
+    def total_disk_bytes(cls):  # pylint: disable=no-self-argument
+        return size_bytes(cls.total_disk)
+
+    @hybrid_property
+    def free_disk_bytes(self):
+        return self.free_disk
+
+    @free_disk_bytes.expression
+    def free_disk_bytes(cls):  # pylint: disable=no-self-argument
+        return size_bytes(cls.free_disk)
@@ -0,0 +1,202 @@
+"""
+Opt-in query instrumentation: count and time the statements issued during a
+logical operation and flag N+1 lazy-loading patterns.
+
+    profiler = QueryProfiler(engine)
+    with profiler.operation("group page") as profile:
+        render_group_page(session, group_id)
+    log.info(profile.format())
+    profile.assert_max_queries(5)
+"""
+import re
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Deque, Dict, List, NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)"
+                      r"(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_WHITESPACE = re.compile(r"\s+")
+
+_current_profile = ContextVar("current_profile", default=None)
+_pending_lazy_load = ContextVar("pending_lazy_load", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so that executions differing only in IN list
+    lengths, literal numbers or whitespace are grouped together.
+    """
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("(?)", shape)
+    return _NUMBER.sub("?", shape)
+
+
+class ShapeStats:
+    __slots__ = ["count", "total_time", "relationship"]
+
+    def __init__(self, relationship: str = None):
+        self.count = 0
+        self.total_time = 0.0
+        self.relationship = relationship
+
+
+class NPlusOne(NamedTuple):
+    """
+    A statement shape repeated count times within one operation, with the
+    relationship whose lazy load issued it (None when it wasn't a lazy
+    load).
+    """
+    relationship: str
+    count: int
+    shape: str
+
+
+class OperationProfile:
+    """
+    Statements issued during one logical operation, grouped by shape.
+    """
+
+    __slots__ = ["name", "threshold", "statements", "total_time", "shapes",
+                 "lazy_loads"]
+
+    def __init__(self, name: str, threshold: int):
+        self.name = name
+        self.threshold = threshold
+        self.statements = 0
+        self.total_time = 0.0
+        self.shapes: Dict[str, ShapeStats] = {}
+        self.lazy_loads: Dict[str, int] = {}
+
+    def record(self, statement: str, elapsed: float, relationship: str):
+        self.statements += 1
+        self.total_time += elapsed
+        shape = statement_shape(statement)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = ShapeStats(relationship)
+        stats.count += 1
+        stats.total_time += elapsed
+        if relationship is not None:
+            self.lazy_loads[relationship] = \
+                self.lazy_loads.get(relationship, 0) + 1
+
+    def n_plus_one(self) -> List[NPlusOne]:
+        """
+        Statement shapes executed at least threshold times, most repeated
+        first.
+        """
+        found = [NPlusOne(stats.relationship, stats.count, shape)
+                 for shape, stats in self.shapes.items()
+                 if stats.count >= self.threshold]
+        return sorted(found, key=lambda x: -x.count)
+
+    def summary(self) -> dict:
+        return {
+            "operation": self.name,
+            "statements": self.statements,
+            "total_time": self.total_time,
+            "distinct_shapes": len(self.shapes),
+            "lazy_loads": dict(self.lazy_loads),
+            "n_plus_one": [x._asdict() for x in self.n_plus_one()],
+        }
+
+    def format(self) -> str:
+        lines = [f"{self.name}: {self.statements} statements in "
+                 f"{self.total_time * 1000:.1f}ms, "
+                 f"{len(self.shapes)} distinct"]
+        for suspect in self.n_plus_one():
+            source = suspect.relationship or "repeated statement"
+            lines.append(f"  possible N+1 via {source}: {suspect.count}x "
+                         f"{suspect.shape[:120]}")
+        return "\n".join(lines)
+
+    def assert_max_queries(self, limit: int):
+        if self.statements > limit:
+            raise AssertionError(f"{self.name} issued {self.statements} "
+                                 f"statements, expected at most {limit}\n"
+                                 + self.format())
+
+
+class QueryProfiler:
+    """
+    Attach statement timing to engine and ORM lazy-load tracking to all
+    sessions. Statements are only recorded while an operation() is active in
+    the current thread or task. Only the last keep finished profiles are
+    kept.
+    """
+
+    __slots__ = ["engine", "threshold", "profiles"]
+
+    def __init__(self, engine: Engine, n_plus_one_threshold: int = 5,
+                 keep: int = 1000):
+        self.engine = engine
+        self.threshold = n_plus_one_threshold
+        # finished profiles, most recent last
+        self.profiles: Deque[OperationProfile] = deque(maxlen=keep)
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+        if not event.contains(Session, "do_orm_execute", _on_orm_execute):
+            event.listen(Session, "do_orm_execute", _on_orm_execute)
+
+    def detach(self):
+        event.remove(self.engine, "before_cursor_execute", _before_execute)
+        event.remove(self.engine, "after_cursor_execute", _after_execute)
+
+    @contextmanager
+    def operation(self, name: str):
+        profile = OperationProfile(name, self.threshold)
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+            self.profiles.append(profile)
+
+    def profile(self, name: str = None):
+        """
+        Decorator form of operation(), named after the function by default.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.operation(name or func.__qualname__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+# pylint: disable=unused-argument,too-many-arguments
+def _before_execute(conn, cursor, statement, parameters, context,
+                    executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context,
+                   executemany):
+    profile = _current_profile.get()
+    if profile is None or not conn.info.get("query_start"):
+        return
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    relationship = _pending_lazy_load.get()
+    _pending_lazy_load.set(None)
+    profile.record(statement, elapsed, relationship)
+
+
+def _on_orm_execute(orm_execute_state):
+    if _current_profile.get() is None:
+        return
+    if orm_execute_state.lazy_loaded_from is not None:
+        path = orm_execute_state.loader_strategy_path
+        prop = getattr(path, "prop", None)
+        _pending_lazy_load.set(str(prop) if prop is not None else
+                               orm_execute_state.lazy_loaded_from.class_
+                               .__name__)
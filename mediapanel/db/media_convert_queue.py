@@ -1,5 +1,6 @@
 # pylint: disable=missing-docstring
-from sqlalchemy import Column, Integer, Boolean, String, TIMESTAMP, ForeignKey
+from sqlalchemy import (Column, Integer, Boolean, String, TIMESTAMP,
+                        ForeignKey, Index)
 
 import sqlalchemy.sql.functions as func
 
@@ -9,6 +10,13 @@ from .base import Base
 # pylint: disable=too-few-public-methods,missing-docstring
 class MediaConvertQueue(Base):
     __tablename__ = "mediaConvertQueue"
+    __table_args__ = (
+        # claiming the oldest queued jobs, and finding expired leases
+        Index("ix_mediaConvertQueue_status_id", "status", "id"),
+        Index("ix_mediaConvertQueue_status_convertTimestamp", "status",
+              "convertTimestamp"),
+        Index("ix_mediaConvertQueue_clientId_status", "clientId", "status"),
+    )
     id = Column(Integer, primary_key=True)
     upload_timestamp = Column("uploadTimestamp", TIMESTAMP, nullable=False,
                               server_default=func.now(),
@@ -0,0 +1,112 @@
+"""
+Query helpers for common access paths over the mediaPanel models.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Query, Session
+
+from .asset import Asset
+from .device import Device
+from .relationships import device2group
+
+# app name (as used in the app_* column names) -> Asset flag column
+APP_COLUMNS = {
+    "digitalFrame": Asset.is_digital_frame,
+    "displayAD": Asset.is_display_ad,
+    "alerts": Asset.is_alerts,
+    "jukebox": Asset.is_jukebox,
+}
+
+
+def assets_for_device(session: Session, device_id: str,
+                      app: str = None) -> Query:
+    """
+    All assets visible to a device: assets assigned to it directly plus the
+    assets of every group it belongs to, optionally limited to one app (see
+    APP_COLUMNS). Both halves are UNIONed into a single statement, each
+    using its own index, rather than an OR that would scan the table.
+    """
+    direct = session.query(Asset).filter(Asset.device_id == device_id)
+    grouped = session.query(Asset)\
+        .join(device2group, device2group.c.groupID == Asset.group_id)\
+        .filter(device2group.c.deviceID == device_id)
+    if app is not None:
+        flag = APP_COLUMNS[app]
+        direct = direct.filter(flag.is_(True))
+        grouped = grouped.filter(flag.is_(True))
+    return direct.union(grouped)
+
+
+# staleness buckets, freshest first, each holding the devices whose last ping
+# is within the given age and not within the previous bucket's
+ONLINE = "online"
+UNDER_HOUR = "under_hour"
+UNDER_DAY = "under_day"
+UNDER_30_DAYS = "under_30_days"
+OVER_30_DAYS = "over_30_days"
+NEVER = "never"
+STALENESS_BUCKETS = (
+    (UNDER_HOUR, timedelta(hours=1)),
+    (UNDER_DAY, timedelta(days=1)),
+    (UNDER_30_DAYS, timedelta(days=30)),
+)
+
+
+class StalenessReport(NamedTuple):
+    """
+    Device counts per staleness bucket, and their device ids if requested.
+    Every bucket is present in counts, even when empty.
+    """
+    now: datetime
+    counts: Dict[str, int]
+    device_ids: Dict[str, List[str]]
+
+
+def staleness_bucket(now: datetime,
+                     online: timedelta = timedelta(minutes=5)):
+    """
+    SQL expression naming the staleness bucket of Device.last_ping at now.
+    The cutoffs are bound parameters computed here, so the comparisons can
+    use the lastCheckInTime indexes.
+    """
+    whens = [(Device.last_ping.is_(None), NEVER),
+             (Device.last_ping >= now - online, ONLINE)]
+    whens.extend((Device.last_ping >= now - age, name)
+                 for name, age in STALENESS_BUCKETS)
+    return case(*whens, else_=OVER_30_DAYS)
+
+
+def device_staleness(session: Session, client_id: int = None,
+                     now: datetime = None,
+                     online: timedelta = timedelta(minutes=5),
+                     with_ids: bool = False) -> StalenessReport:
+    """
+    Count devices (of one client, or the whole fleet) per staleness bucket
+    in a single GROUP BY over the lastCheckInTime indexes, optionally also
+    listing their device ids. Devices that pinged within online are online.
+    """
+    if now is None:
+        now = datetime.now()
+    bucket = staleness_bucket(now, online).label("bucket")
+    names = [ONLINE] + [name for name, _ in STALENESS_BUCKETS] \
+        + [OVER_30_DAYS, NEVER]
+    counts = dict.fromkeys(names, 0)
+    device_ids = {name: [] for name in names} if with_ids else {}
+
+    if with_ids:
+        query = session.query(Device.device_id, bucket)
+    else:
+        query = session.query(bucket, func.count()).group_by(bucket)
+    if client_id is not None:
+        query = query.filter(Device.client_id == client_id)
+
+    if with_ids:
+        for device_id, name in query:
+            counts[name] += 1
+            device_ids[name].append(device_id)
+    else:
+        for name, count in query:
+            counts[name] = count
+    return StalenessReport(now, counts, device_ids)
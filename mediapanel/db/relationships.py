@@ -1,5 +1,5 @@
 # pylint: disable=missing-docstring,invalid-name
-from sqlalchemy import Table, Column, String, Integer, ForeignKey
+from sqlalchemy import Table, Column, String, Integer, ForeignKey, Index
 
 from .base import Base
 
@@ -7,12 +7,16 @@ device2group = Table(
     "device2groups",
     Base.metadata,
     Column("deviceID", String(45), ForeignKey("devices.deviceID")),
-    Column("groupID", Integer, ForeignKey("groups.groupID"))
+    Column("groupID", Integer, ForeignKey("groups.groupID")),
+    Index("ix_device2groups_deviceID_groupID", "deviceID", "groupID"),
+    Index("ix_device2groups_groupID", "groupID")
 )
 
 user2device = Table(
     "users2devices",
     Base.metadata,
     Column("deviceID", String(45), ForeignKey("devices.deviceID")),
-    Column("userID", Integer, ForeignKey("users.userID"))
+    Column("userID", Integer, ForeignKey("users.userID")),
+    Index("ix_users2devices_deviceID", "deviceID"),
+    Index("ix_users2devices_userID", "userID")
 )
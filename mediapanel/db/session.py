@@ -0,0 +1,200 @@
+"""
+Engine and session factory for the mediaPanel database, with connection
+pooling suited to MySQL's idle timeouts and pool usage metrics.
+"""
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+
+class PoolMetrics:
+    """
+    Connection pool counters for one engine: connections opened, checkouts,
+    connections currently checked out (and the peak), and the time spent
+    waiting for a connection to become available.
+    """
+
+    __slots__ = ["connects", "checkouts", "in_use", "peak_in_use",
+                 "wait_count", "wait_total", "wait_max", "_lock"]
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = Lock()
+
+    def attach(self, engine: Engine):
+        """
+        Start collecting metrics for engine's pool.
+        """
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.metrics = self
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    # pylint: disable=unused-argument
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record,
+                     connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.in_use -= 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "wait_count": self.wait_count,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "wait_avg": (self.wait_total / self.wait_count
+                             if self.wait_count else 0.0),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that reports how long each checkout waited for a connection
+    to its PoolMetrics.
+    """
+
+    metrics = None
+
+    def _do_get(self):
+        start = perf_counter()
+        connection = super()._do_get()
+        if self.metrics is not None:
+            self.metrics.record_wait(perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def make_engine(url: str, pool_size: int = 5, max_overflow: int = 10,
+                pool_timeout: float = 30, pool_recycle: int = 3600,
+                pool_pre_ping: bool = True, metrics: PoolMetrics = None,
+                **kwargs) -> Engine:
+    """
+    Create an engine with a bounded, pre-pinged connection pool. Connections
+    are recycled after pool_recycle seconds so they are replaced before
+    MySQL's wait_timeout closes them server-side.
+
+    In-memory SQLite databases can't be shared through a pool, so they use a
+    single static connection instead and the pool settings are ignored.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" \
+            and parsed.database in (None, "", ":memory:"):
+        kwargs.setdefault("poolclass", StaticPool)
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+    else:
+        kwargs.setdefault("poolclass", TimedQueuePool)
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow,
+                      pool_timeout=pool_timeout, pool_recycle=pool_recycle)
+    engine = create_engine(url, pool_pre_ping=pool_pre_ping, **kwargs)
+    if metrics is not None:
+        metrics.attach(engine)
+    return engine
+
+
+class SessionFactory:
+    """
+    Owns an engine and hands out sessions, either per unit of work through
+    session_scope() or per request/thread through scoped (call remove() when
+    the request is done).
+    """
+
+    __slots__ = ["engine", "metrics", "sessionmaker", "scoped"]
+
+    def __init__(self, url: str = None, engine: Engine = None, **kwargs):
+        if (url is None) == (engine is None):
+            raise ValueError("exactly one of url and engine must be given")
+        self.metrics = PoolMetrics()
+        if engine is None:
+            engine = make_engine(url, metrics=self.metrics, **kwargs)
+        else:
+            self.metrics.attach(engine)
+        self.engine = engine
+        self.sessionmaker = sessionmaker(bind=engine)
+        self.scoped = scoped_session(self.sessionmaker)
+
+    def __call__(self) -> Session:
+        return self.sessionmaker()
+
+    @contextmanager
+    def session_scope(self):
+        """
+        Provide a session that is committed on success, rolled back on error
+        and always closed.
+        """
+        session = self.sessionmaker()
+        try:
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def remove(self):
+        """
+        Close and discard the current scoped session, at the end of a
+        request.
+        """
+        self.scoped.remove()
+
+    def warm(self, count: int = None) -> int:
+        """
+        Open up to count connections (the pool size by default) at startup
+        so the first requests don't pay for connecting. Returns the number of
+        connections opened.
+        """
+        if count is None:
+            size = getattr(self.engine.pool, "size", None)
+            count = size() if callable(size) else 1
+        connections = []
+        try:
+            for _ in range(count):
+                connection = self.engine.connect()
+                connection.execute(text("SELECT 1"))
+                connections.append(connection)
+        finally:
+            for connection in connections:
+                connection.close()
+        return len(connections)
+
+    def dispose(self):
+        self.scoped.remove()
+        self.engine.dispose()
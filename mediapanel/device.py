@@ -3,13 +3,28 @@ Device ORM to pull the various config sources.
 """
 
 from functools import partial
-from typing import Callable
+from os import listdir
+from os.path import dirname
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Union
 
-from sqlalchemy.orm import Session
+from .config.ads import AdsConfig, AdsHorizontalConfig, AdsVerticalConfig
+from .config.events import EventsConfig
+from .config.general import GeneralConfig
+from .config.layout import LayoutConfig
+from .config.section import DEFAULT_BASE_PATH, Config
 
-from .config import GeneralConfig, LayoutConfig
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from sqlalchemy.orm import Session
+    from .db import Device as device_sql
 
-from .db import Device as device_sql
+
+def __getattr__(name):
+    # the ORM (and SQLAlchemy) is only imported once SQL is actually used
+    if name == "device_sql":
+        from .db import Device  # pylint: disable=import-outside-toplevel
+        return Device
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Device:
@@ -18,7 +33,10 @@ class Device:
     """
 
     # pylint: disable=missing-docstring
-    __slots__ = "client_id", "device_id", "v6_path", "_general", "_layout"
+    __slots__ = "client_id", "device_id", "v6_path", "_configs"
+
+    SECTIONS = (GeneralConfig, LayoutConfig, EventsConfig, AdsConfig,
+                AdsVerticalConfig, AdsHorizontalConfig)
 
     @staticmethod
     def config_path(path: str) -> Callable[[int, int], 'Device']:
@@ -28,26 +46,126 @@ class Device:
         self.client_id = client_id
         self.device_id = device_id
         self.v6_path = v6_path
-        self._general = None
-        self._layout = None
+        self._configs = {}
 
-    def sql(self, session: Session) -> device_sql:
+    def sql(self, session: 'Session') -> 'device_sql':
+        # pylint: disable=import-outside-toplevel
+        from .db import Device as device_sql
         return session.query(device_sql)\
                 .filter_by(device_id=self.device_id)\
                 .first()
 
+    @staticmethod
+    def sql_many(session: 'Session',
+                 devices: Iterable[Union['Device', str]],
+                 eager: Iterable[str] = (),
+                 chunk_size: int = 500) -> Dict[str, 'device_sql']:
+        """
+        Look up the SQL rows for many devices (Device objects or device_ids)
+        with one IN query per chunk_size devices. Relationships named in
+        eager ("assets", "groups", "allowed_users") are loaded up front with
+        one extra query per relationship per chunk, instead of lazily per
+        device. Devices without a row are left out of the result.
+        """
+        # pylint: disable=import-outside-toplevel
+        from sqlalchemy.orm import selectinload
+        from .db import Device as device_sql
+
+        device_ids = list(dict.fromkeys(
+            d.device_id if isinstance(d, Device) else d for d in devices))
+        options = [selectinload(getattr(device_sql, name)) for name in eager]
+
+        rows = {}
+        for start in range(0, len(device_ids), chunk_size):
+            chunk = device_ids[start:start + chunk_size]
+            query = session.query(device_sql)\
+                .filter(device_sql.device_id.in_(chunk))\
+                .options(*options)
+            for row in query:
+                rows[row.device_id] = row
+        return rows
+
+    def config(self, section: type, listing: Iterable[str] = None) \
+            -> Config:
+        """
+        Load the given config section for this device on first access.
+        listing is passed on to Config.v6_path.
+        """
+        config = self._configs.get(section)
+        if config is None:
+            path = section.v6_path(self.client_id, self.device_id,
+                                   self.v6_path or DEFAULT_BASE_PATH, listing)
+            config = self._configs[section] = section.from_v6_file(path)
+        return config
+
+    def prefetch(self, sections: Iterable[type] = SECTIONS,
+                 executor: 'Executor' = None) -> Dict[type, Exception]:
+        """
+        Load every section not loaded yet concurrently, with executor or a
+        thread per section. The ads fallback paths are resolved from one
+        listing of their directory shared by all ads sections. Sections that
+        fail to load (typically missing files) are returned with their
+        exception, and raise again when accessed.
+        """
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor
+
+        sections = [s for s in sections if s not in self._configs]
+        if not sections:
+            return {}
+        listings = {}
+        base_path = self.v6_path or DEFAULT_BASE_PATH
+        device_path = f"{base_path}/{self.client_id}/1/{self.device_id}"
+        for section in sections:
+            if isinstance(section.file_path, str):
+                continue
+            directory = dirname(section.file_path[0])
+            if directory not in listings:
+                try:
+                    listings[directory] = listdir(
+                        f"{device_path}/{directory}")
+                except (FileNotFoundError, NotADirectoryError):
+                    listings[directory] = ()
+
+        def load(section):
+            listing = None
+            if not isinstance(section.file_path, str):
+                listing = listings[dirname(section.file_path[0])]
+            return self.config(section, listing)
+
+        owned = executor is None
+        if owned:
+            executor = ThreadPoolExecutor(len(sections))
+        try:
+            futures = {section: executor.submit(load, section)
+                       for section in sections}
+            return {section: future.exception()
+                    for section, future in futures.items()
+                    if future.exception() is not None}
+        finally:
+            if owned:
+                executor.shutdown()
+
     @property
     def general(self) -> GeneralConfig:
-        if self._general is None:
-            self._general = GeneralConfig.from_v6_id(self.client_id,
-                                                     self.device_id,
-                                                     self.v6_path)
-        return self._general
+        return self.config(GeneralConfig)
 
     @property
     def layout(self) -> LayoutConfig:
-        if self._layout is None:
-            self._layout = LayoutConfig.from_v6_id(self.client_id,
-                                                   self.device_id,
-                                                   self.v6_path)
-        return self._layout
+        return self.config(LayoutConfig)
+
+    @property
+    def events(self) -> EventsConfig:
+        return self.config(EventsConfig)
+
+    @property
+    def ads(self) -> AdsConfig:
+        return self.config(AdsConfig)
+
+    @property
+    def ads_vertical(self) -> AdsVerticalConfig:
+        return self.config(AdsVerticalConfig)
+
+    @property
+    def ads_horizontal(self) -> AdsHorizontalConfig:
+        return self.config(AdsHorizontalConfig)
@@ -0,0 +1,127 @@
+"""
+Push a config change to every device of a group.
+
+Devices are looked up in one short session, their configs are loaded, mutated
+and saved on a thread pool without holding a database connection, and the
+update flags of the devices whose files changed are then set with bulk
+UPDATE ... WHERE deviceID IN (...) statements in a second short session.
+"""
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Tuple
+
+from sqlalchemy.orm import Session
+
+from .codec import dumps_v6
+from .config.fleet import run_bounded
+from .config.section import DEFAULT_BASE_PATH, Config
+from .db import Device
+from .db.relationships import device2group
+
+
+class FanoutResult(NamedTuple):
+    """
+    Outcome of applying the mutation to one device. changed is True if its
+    config file was rewritten; error is set if loading, mutating or saving
+    failed.
+    """
+    client_id: int
+    device_id: str
+    path: str
+    changed: bool
+    error: Exception
+
+
+class FanoutReport(NamedTuple):
+    """
+    Per-device results of a fan-out, and the number of device rows whose
+    update flags were set.
+    """
+    results: List[FanoutResult]
+    flagged: int
+
+    @property
+    def changed(self) -> List[str]:
+        return [r.device_id for r in self.results if r.changed]
+
+    @property
+    def failed(self) -> List[FanoutResult]:
+        return [r for r in self.results if r.error is not None]
+
+
+@contextmanager
+def _session(session_factory: Callable[[], Session]):
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def group_devices(session: Session, group_id: int) -> List[Tuple[int, str]]:
+    """
+    (client_id, device_id) of every device in a group, without loading the
+    Device rows.
+    """
+    return [tuple(row) for row in session.query(Device.client_id,
+                                                Device.device_id)
+            .join(device2group, device2group.c.deviceID == Device.device_id)
+            .filter(device2group.c.groupID == group_id)
+            .order_by(Device.device_id)]
+
+
+def _apply(section: type, client_id: int, device_id: str, base_path: str,
+           mutate: Callable[[Config], None], fsync: bool) -> Tuple[str, bool]:
+    config = section.from_v6_id(client_id, device_id, base_path)
+    before = dumps_v6(config)
+    mutate(config)
+    if dumps_v6(config) == before:
+        return config.path, False
+    return config.path, config.save_v6(fsync).written
+
+
+def fan_out(session_factory: Callable[[], Session], group_id: int,
+            section: type, mutate: Callable[[Config], None],
+            base_path: str = DEFAULT_BASE_PATH, max_workers: int = None,
+            update_settings: bool = True, update_content: bool = False,
+            fsync: bool = False, chunk_size: int = 1000) -> FanoutReport:
+    """
+    Apply mutate(config) to the given config section of every device in a
+    group, in parallel, saving only the files whose content changed. The
+    devices whose files changed then get updateSettings and/or
+    updateContent set, with one UPDATE per chunk_size devices in a single
+    transaction. session_factory is any callable returning a new Session,
+    such as a SessionFactory or a sessionmaker.
+    """
+    with _session(session_factory) as session:
+        devices = group_devices(session, group_id)
+
+    jobs = (((client_id, device_id), _apply,
+             (section, client_id, device_id, base_path, mutate, fsync))
+            for client_id, device_id in devices)
+    results = []
+    for (client_id, device_id), outcome, error in \
+            run_bounded(jobs, max_workers):
+        path, changed = outcome if error is None else (None, False)
+        results.append(FanoutResult(client_id, device_id, path, changed,
+                                    error))
+    results.sort(key=lambda r: r.device_id)
+
+    values = {}
+    if update_settings:
+        values[Device.update_settings] = True
+    if update_content:
+        values[Device.update_content] = True
+    changed = [r.device_id for r in results if r.changed]
+    flagged = 0
+    if values and changed:
+        with _session(session_factory) as session:
+            for start in range(0, len(changed), chunk_size):
+                flagged += session.query(Device)\
+                    .filter(Device.device_id.in_(
+                        changed[start:start + chunk_size]))\
+                    .update(values, synchronize_session=False)
+    return FanoutReport(results, flagged)
@@ -0,0 +1,70 @@
+"""
+File helpers shared by the config and applet storage writers.
+"""
+from os import close, fchmod, fsync as os_fsync, open as os_open, replace, \
+    stat, unlink, write, O_RDONLY
+from os.path import basename, dirname
+from stat import S_IMODE
+
+
+def same_content(path: str, data: bytes) -> bool:
+    """
+    Check whether the file at path already holds exactly data, comparing
+    sizes first and content hashes only when the sizes match.
+    """
+    # hashlib and tempfile are imported on first use, to keep them out of
+    # the import time of the config modules
+    # pylint: disable=import-outside-toplevel
+    import hashlib
+    try:
+        if stat(path).st_size != len(data):
+            return False
+        with open(path, "rb") as existing:
+            on_disk = hashlib.sha256(existing.read()).digest()
+    except FileNotFoundError:
+        return False
+    return on_disk == hashlib.sha256(data).digest()
+
+
+def atomic_write(path: str, data: bytes, fsync: bool = False,
+                 mode: int = 0o644):
+    """
+    Write data to a uniquely named temporary file next to path and rename it
+    into place, so readers only ever see the old or the new content. An
+    existing file's permissions are preserved, new files get mode. With
+    fsync, the file and its directory are flushed to disk before returning.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tempfile import mkstemp
+    directory = dirname(path) or "."
+    try:
+        mode = S_IMODE(stat(path).st_mode)
+    except FileNotFoundError:
+        pass
+
+    fd, temp_path = mkstemp(dir=directory, prefix="." + basename(path) + ".",
+                            suffix="~")
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[write(fd, view):]
+            fchmod(fd, mode)
+            if fsync:
+                os_fsync(fd)
+        finally:
+            close(fd)
+        replace(temp_path, path)
+    except BaseException:
+        try:
+            unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if fsync:
+        dir_fd = os_open(directory, O_RDONLY)
+        try:
+            os_fsync(dir_fd)
+        finally:
+            close(dir_fd)
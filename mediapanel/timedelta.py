@@ -2,6 +2,7 @@
 Utility function for formatting a datetime.timedelta as a string.
 """
 from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
 
 
 def _make_plural(count: int, modifier: str, extention: str = "s") -> str:
@@ -10,12 +11,36 @@ def _make_plural(count: int, modifier: str, extention: str = "s") -> str:
     return str(count) + " " + modifier + extention
 
 
-def human_readable(td: timedelta) -> str:
+def _unit(td: timedelta) -> Tuple[int, str]:
     if td.days > 30:  # x months
-        return _make_plural(td.days // 30, "month")
+        return td.days // 30, "month"
     elif td.days > 0:  # x days
-        return _make_plural(td.days, "day")
+        return td.days, "day"
     elif td.seconds > 3600:  # x hours
-        return _make_plural(td.seconds // 3600, "hour")
+        return td.seconds // 3600, "hour"
     else:  # x minutes
-        return _make_plural(td.seconds // 60, "minute")
+        return td.seconds // 60, "minute"
+
+
+def human_readable(td: timedelta) -> str:
+    return _make_plural(*_unit(td))
+
+
+def human_readable_many(tds: Iterable[Optional[timedelta]],
+                        never: str = "never") -> List[str]:
+    """
+    human_readable() for many timedeltas at once, formatting each distinct
+    output only once. None (e.g. a device that never pinged) becomes never.
+    """
+    strings = {}
+    results = []
+    for td in tds:
+        if td is None:
+            results.append(never)
+            continue
+        unit = _unit(td)
+        string = strings.get(unit)
+        if string is None:
+            string = strings[unit] = _make_plural(*unit)
+        results.append(string)
+    return results
@@ -6,5 +6,7 @@ setup(
     name="mediapanel",
     version="0.1.0",
     packages=["mediapanel", "mediapanel.config", "mediapanel.db"],
-    install_requires=["sqlalchemy"]
+    install_requires=["sqlalchemy"],
+    # zoneinfo, used by mediapanel.config.playlist
+    python_requires=">=3.9"
 )
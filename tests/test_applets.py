@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from mediapanel.applets import (FileBackend, SQLiteBackend, StorageCache,
+                                StorageManager)
+
+
+class FlakyBackend(FileBackend):
+    """
+    FileBackend failing the fail_at-th write_many counted in calls, which
+    is shared between backends.
+    """
+
+    def __init__(self, applet_directory, calls, fail_at):
+        super().__init__(applet_directory)
+        self.calls = calls
+        self.fail_at = fail_at
+
+    def write_many(self, items):
+        self.calls.append(self)
+        if len(self.calls) == self.fail_at:
+            raise OSError("disk full")
+        return super().write_many(items)
+
+
+def _on_disk(directory, client_id, applet="weather", context="state"):
+    with open(directory / str(client_id) / applet / f"{context}.json") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def cache():
+    cache = StorageCache(flush_interval=3600)
+    yield cache
+    cache.flush()
+
+
+def test_save_is_written_back_on_flush(tmp_path, cache):
+    manager = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    manager.save({"v": 1})
+    assert not (tmp_path / "1").exists()
+    assert manager.load() == {"v": 1}
+    cache.flush()
+    assert _on_disk(tmp_path, 1) == {"v": 1}
+    assert cache.stats()["dirty"] == 0
+
+
+def test_managers_share_entries(tmp_path, cache):
+    first = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    second = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    first.save({"v": 1})
+    cache.flush()
+    first.save({"v": 2})
+    assert second.load() == {"v": 2}
+
+
+def test_load_sees_external_writes(tmp_path, cache):
+    manager = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    manager.save({"v": 1})
+    cache.flush()
+    assert manager.load() == {"v": 1}
+    StorageManager("weather", "state", 1, str(tmp_path)).save({"v": 2, "x": 0})
+    assert manager.load() == {"v": 2, "x": 0}
+
+
+def test_save_many_supersedes_pending_saves(tmp_path, cache):
+    manager = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    manager.save({"v": 3})
+    manager.save_many({1: {"v": 99}, 2: {"v": 100}})
+    cache.flush()
+    assert _on_disk(tmp_path, 1) == {"v": 99}
+    assert dict(manager.scan()) == {1: {"v": 99}, 2: {"v": 100}}
+
+
+def test_load_many_and_scan_see_pending_saves(tmp_path, cache):
+    manager = StorageManager("weather", "state", 1, str(tmp_path), cache)
+    manager.save({"v": 1}, 1)
+    manager.save({"v": 2}, 2)
+    assert manager.load_many([1, 2, 3]) == {1: {"v": 1}, 2: {"v": 2}}
+    manager.save({"v": 3}, 2)
+    assert dict(manager.scan()) == {1: {"v": 1}, 2: {"v": 3}}
+
+
+def test_flush_recovers_from_a_failing_backend(tmp_path, cache):
+    # a shared cache with one backend per manager; the second backend
+    # written to by the flush fails after the first one was written
+    calls = []
+    managers = [StorageManager("weather", "state", 1, cache=cache,
+                               backend=FlakyBackend(str(tmp_path / str(n)),
+                                                    calls, 2))
+                for n in range(2)]
+    for n, manager in enumerate(managers):
+        manager.save({"n": n})
+
+    with pytest.raises(OSError):
+        cache.flush()
+    cache.flush()
+    for n in range(2):
+        assert _on_disk(tmp_path / str(n), 1) == {"n": n}
+    assert cache.stats()["dirty"] == 0
+    assert cache.stats()["dirty_bytes"] == 0
+
+
+def test_sqlite_write_many_returns_written_versions(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "applets.db"))
+    first, second = (1, "weather", "state"), (2, "weather", "state")
+    assert backend.write_many({first: b"{}", second: b"{}"}) == \
+        {first: 1, second: 1}
+    assert backend.write_many({first: b"[]"}) == {first: 2}
+    assert backend.read(first) == (b"[]", 2)
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from mediapanel.config import changes
+from mediapanel.config.changes import CREATED, MODIFIED, ChangeFeed
+
+EVENTS = "home/mediapanel/themes/events/eventsConfig.json"
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(content))
+
+
+def _kinds(found):
+    return sorted((c.client_id, c.device_id, c.kind) for c in found)
+
+
+def test_checkpoint_is_rate_limited(tmp_path):
+    base, checkpoint = tmp_path / "tree", tmp_path / "checkpoint"
+    _write(base / "5" / "1" / "dev" / EVENTS, {"people": []})
+    feed = ChangeFeed(str(base), checkpoint_path=str(checkpoint),
+                      use_inotify=False, checkpoint_interval=3600)
+    assert _kinds(feed.poll()) == [(5, "dev", CREATED)]
+    saved = checkpoint.read_bytes()
+
+    _write(base / "5" / "1" / "dev" / EVENTS, {"people": [1]})
+    assert _kinds(feed.poll()) == [(5, "dev", MODIFIED)]
+    assert checkpoint.read_bytes() == saved
+
+    feed.close()
+    assert checkpoint.read_bytes() != saved
+    assert ChangeFeed(str(base), checkpoint_path=str(checkpoint),
+                      use_inotify=False).poll() == []
+
+
+@pytest.mark.skipif(changes.inotify_simple is None,
+                    reason="inotify_simple is not installed")
+def test_inotify_sees_new_directories(tmp_path):
+    (tmp_path / "5" / "1" / "dev").mkdir(parents=True)
+    feed = ChangeFeed(str(tmp_path))
+    assert feed.poll() == []
+
+    # a config directory created after its device, and a new client
+    _write(tmp_path / "5" / "1" / "dev" / EVENTS, {})
+    _write(tmp_path / "7" / "1" / "dev" / EVENTS, {})
+    assert _kinds(feed.poll(0.5)) == [(5, "dev", CREATED),
+                                      (7, "dev", CREATED)]
+
+    _write(tmp_path / "7" / "1" / "dev" / EVENTS, {"people": []})
+    assert _kinds(feed.poll(0.5)) == [(7, "dev", MODIFIED)]
+    feed.close()
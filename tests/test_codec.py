@@ -0,0 +1,30 @@
+import json
+import math
+
+import pytest
+
+from mediapanel import codec
+
+
+@pytest.fixture(params=codec.AVAILABLE)
+def backend(request):
+    previous = codec.BACKEND
+    codec.use(request.param)
+    yield request.param
+    if previous is not None:
+        codec.use(previous)
+
+
+@pytest.mark.parametrize("obj", [
+    {"a": None, "b": "null", "c": [1, 2.5, True]},
+    {"wide": 2 ** 70},
+    {"values": [1.5, {"nested": float("inf")}]},
+])
+def test_dumps_round_trips(backend, obj):
+    # pylint: disable=unused-argument
+    assert json.loads(codec.dumps(obj)) == obj
+
+
+def test_dumps_keeps_nan(backend):
+    # pylint: disable=unused-argument
+    assert math.isnan(json.loads(codec.dumps({"a": float("nan")}))["a"])
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from benchmarks.fleet import generate_tree
+from mediapanel.config import GeneralConfig
+from mediapanel.config.section import CONFIG_CACHE, ConfigCache
+
+
+class Parsed:
+    pass
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    (client_id, device_id), = generate_tree(str(tmp_path), clients=1,
+                                            devices=1, people=1, ads=1)
+    CONFIG_CACHE.clear()
+    yield GeneralConfig.v6_path(client_id, device_id, str(tmp_path))
+    CONFIG_CACHE.clear()
+
+
+def test_external_write_invalidates(config_path):
+    cache = ConfigCache()
+    first = Parsed()
+    cache.put(Parsed, config_path, first, cache.signature(config_path))
+    assert cache.get(Parsed, config_path) is first
+
+    with open(config_path, "a") as f:
+        f.write(" ")
+    assert cache.get(Parsed, config_path) is None
+
+    # a replaced file is detected even with the same size and mtime
+    info = os.stat(config_path)
+    cache.put(Parsed, config_path, first, cache.signature(config_path))
+    replacement = config_path + ".new"
+    with open(config_path) as f, open(replacement, "w") as out:
+        out.write(f.read())
+    os.replace(replacement, config_path)
+    os.utime(config_path, ns=(info.st_atime_ns, info.st_mtime_ns))
+    assert cache.get(Parsed, config_path) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_and_invalidate(tmp_path):
+    cache = ConfigCache(maxsize=2)
+    paths = []
+    for n in range(3):
+        path = tmp_path / f"{n}.json"
+        path.write_text("{}")
+        paths.append(str(path))
+    objects = [Parsed() for _ in paths]
+    for path, obj in zip(paths[:2], objects):
+        cache.put(Parsed, path, obj, cache.signature(path))
+    assert cache.get(Parsed, paths[0]) is objects[0]
+    cache.put(Parsed, paths[2], objects[2], cache.signature(paths[2]))
+
+    assert cache.get(Parsed, paths[1]) is None
+    assert cache.get(Parsed, paths[0]) is objects[0]
+    assert cache.stats()["evictions"] == 1
+
+    cache.put(str, paths[0], "other class", cache.signature(paths[0]))
+    cache.invalidate(paths[0])
+    assert cache.get(Parsed, paths[0]) is None
+    assert cache.get(str, paths[0]) is None
+
+
+def test_cached_loads(config_path):
+    first = GeneralConfig.from_v6_file(config_path, cached=True)
+    assert GeneralConfig.from_v6_file(config_path, cached=True) is first
+    assert GeneralConfig.from_v6_file(config_path) is not first
+
+    first.nickname = "hall"
+    first.save_v6()
+    reloaded = GeneralConfig.from_v6_file(config_path, cached=True)
+    assert reloaded is not first
+    assert reloaded.nickname == "hall"
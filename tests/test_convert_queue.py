@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from mediapanel.convert_queue import ConvertQueue, run_workers
+from mediapanel.db import Base, MediaConvertQueue, SessionFactory
+
+
+@pytest.fixture
+def queue():
+    factory = SessionFactory("sqlite://")
+    Base.metadata.create_all(factory.engine)
+    with factory.session_scope() as session:
+        session.add_all(MediaConvertQueue(
+            client_id=1, filename=f"{n}.mp4", filepath=f"/media/{n}.mp4",
+            status=ConvertQueue.QUEUED, mode="video", is_digital_frame=False,
+            is_display_ad=True, is_alerts=False, is_jukebox=False)
+            for n in range(3))
+    return ConvertQueue(factory)
+
+
+def _expire_leases(queue: ConvertQueue):
+    with queue.session_factory.session_scope() as session:
+        session.query(MediaConvertQueue)\
+            .update({MediaConvertQueue.convert_timestamp:
+                     datetime.now() - queue.lease - timedelta(seconds=1)})
+
+
+def _statuses(queue: ConvertQueue):
+    with queue.session_factory.session_scope() as session:
+        return [status for status, in session.query(MediaConvertQueue.status)
+                .order_by(MediaConvertQueue.id)]
+
+
+def test_complete(queue):
+    jobs = queue.claim()
+    assert len(jobs) == 3
+    assert queue.claim() == []
+    assert queue.complete(jobs[:2]) == 2
+    assert queue.fail(jobs[2:]) == 1
+    assert _statuses(queue) == [ConvertQueue.CONVERTED] * 2 \
+        + [ConvertQueue.FAILED]
+
+
+def test_requeue_expired(queue):
+    queue.claim()
+    assert queue.requeue_expired() == 0
+    _expire_leases(queue)
+    assert queue.requeue_expired() == 3
+    assert _statuses(queue) == [ConvertQueue.QUEUED] * 3
+
+
+def test_stale_complete_after_reclaim(queue):
+    queue.lease = timedelta(0)
+    stale = queue.claim()
+    assert queue.requeue_expired() == 3
+    fresh = queue.claim()
+    assert [job.id for job in fresh] == [job.id for job in stale]
+
+    assert queue.complete(stale) == 0
+    assert queue.fail(stale) == 0
+    assert _statuses(queue) == [ConvertQueue.CONVERTING] * 3
+    assert queue.complete(fresh) == 3
+
+
+def test_extend(queue):
+    jobs = queue.claim()
+    renewed = queue.extend(jobs)
+    assert [job.id for job in renewed] == [job.id for job in jobs]
+    assert all(new.claimed_at > old.claimed_at
+               for new, old in zip(renewed, jobs))
+    assert queue.complete(jobs) == 0
+    assert queue.complete(renewed) == 3
+
+
+def test_extend_after_reclaim(queue):
+    queue.lease = timedelta(0)
+    stale = queue.claim()
+    queue.requeue_expired()
+    queue.claim()
+    assert queue.extend(stale) == []
+
+
+def slow_convert(job):
+    time.sleep(4)
+    with open(job.filepath, "a") as f:
+        f.write("converted\n")
+
+
+def test_run_workers_renews_leases(tmp_path):
+    factory = SessionFactory("sqlite://")
+    Base.metadata.create_all(factory.engine)
+    with factory.session_scope() as session:
+        session.add_all(MediaConvertQueue(
+            client_id=1, filename=f"{n}.mp4",
+            filepath=str(tmp_path / f"{n}.log"), status=ConvertQueue.QUEUED,
+            mode="video", is_digital_frame=False, is_display_ad=True,
+            is_alerts=False, is_jukebox=False)
+            for n in range(2))
+    queue = ConvertQueue(factory, lease=timedelta(seconds=3))
+
+    # conversions outlive the lease, so without renewal they would be
+    # re-queued and converted again
+    assert run_workers(queue, slow_convert, processes=1, poll_interval=0.5,
+                       once=True) == 2
+    assert _statuses(queue) == [ConvertQueue.CONVERTED] * 2
+    for n in range(2):
+        assert (tmp_path / f"{n}.log").read_text() == "converted\n"
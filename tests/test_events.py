@@ -0,0 +1,74 @@
+from datetime import date, datetime
+
+import pytest
+
+from mediapanel.config.events import Event, EventIndex, Person
+
+BIRTHDAY = Event("birthday")
+HIRED = Event("hired")
+
+
+@pytest.fixture
+def people():
+    return [Person("leap", [(BIRTHDAY, date(2000, 2, 29))]),
+            Person("new year", [(BIRTHDAY, date(1990, 1, 1))]),
+            Person("christmas", [(BIRTHDAY, date(1985, 12, 25)),
+                                 (HIRED, date(2020, 12, 25))])]
+
+
+def _names(results):
+    return [(day, person.name, event.name) for day, person, event in results]
+
+
+def test_exact_dates(people):
+    index = EventIndex.from_people(people)
+    assert _names(index.on(date(2020, 12, 25))) == [
+        (date(2020, 12, 25), "christmas", "hired")]
+    assert _names(index.between(date(1985, 1, 1), date(1999, 12, 31))) == [
+        (date(1985, 12, 25), "christmas", "birthday"),
+        (date(1990, 1, 1), "new year", "birthday")]
+    assert [name for _, name, _ in
+            _names(index.upcoming(date(1990, 1, 2), 5))] == ["leap",
+                                                             "christmas"]
+
+
+def test_leap_day(people):
+    index = EventIndex.from_people(people)
+    assert _names(index.anniversaries_on(date(2023, 2, 28))) == [
+        (date(2023, 2, 28), "leap", "birthday")]
+    assert _names(index.anniversaries_on(date(2024, 2, 29))) == [
+        (date(2024, 2, 29), "leap", "birthday")]
+    assert index.anniversaries_on(date(2024, 2, 28)) == []
+    assert index.anniversaries_on(date(2023, 3, 1)) == []
+    assert len(index.anniversaries_between(date(2023, 2, 1),
+                                           date(2023, 2, 28))) == 1
+    assert index.anniversaries_between(date(2023, 2, 1),
+                                       date(2023, 2, 27)) == []
+    assert _names(index.upcoming_anniversaries(date(2023, 2, 28), 1)) == [
+        (date(2023, 2, 28), "leap", "birthday")]
+
+
+def test_year_wrap(people):
+    index = EventIndex.from_people(people)
+    assert _names(index.anniversaries_between(date(2023, 12, 20),
+                                              date(2024, 1, 10))) == [
+        (date(2023, 12, 25), "christmas", "birthday"),
+        (date(2023, 12, 25), "christmas", "hired"),
+        (date(2024, 1, 1), "new year", "birthday")]
+    assert [day for day, _, _ in index.upcoming_anniversaries(
+        date(2023, 12, 26), 6)] == [date(2024, 1, 1), date(2024, 2, 29),
+                                    date(2024, 12, 25), date(2024, 12, 25),
+                                    date(2025, 1, 1), date(2025, 2, 28)]
+
+
+def test_person_updates_index(people):
+    index = EventIndex.from_people(people)
+    people[1].add_event(HIRED, datetime(2021, 6, 1, 9, 30))
+    assert _names(index.anniversaries_on(date(2030, 6, 1))) == [
+        (date(2030, 6, 1), "new year", "hired")]
+    people[2].remove_event(BIRTHDAY)
+    assert _names(index.anniversaries_on(date(2030, 12, 25))) == [
+        (date(2030, 12, 25), "christmas", "hired")]
+    people[2].remove_event(HIRED, datetime(2020, 12, 25))
+    assert index.on(date(2020, 12, 25)) == []
+    assert len(index) == 3
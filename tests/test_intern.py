@@ -0,0 +1,29 @@
+from benchmarks.fleet import generate_tree
+from mediapanel.config import EventsConfig
+from mediapanel.config.intern import INTERNER
+
+
+def _load(base_path, pairs, read_only):
+    INTERNER.clear()
+    return [EventsConfig.from_v6_id(client_id, device_id, str(base_path),
+                                    interned=True, read_only=read_only)
+            for client_id, device_id in pairs]
+
+
+def test_interned_loads_are_private_copies(tmp_path):
+    pairs = generate_tree(str(tmp_path), clients=1, devices=2, people=5,
+                          ads=1)
+    first, second = _load(tmp_path, pairs, read_only=False)
+    assert first.people is not second.people
+    first.people.pop()
+    assert len(second.people) == len(first.people) + 1
+    assert INTERNER.stats()["unique"] == 1
+
+
+def test_read_only_loads_share_content(tmp_path):
+    pairs = generate_tree(str(tmp_path), clients=1, devices=2, people=5,
+                          ads=1)
+    first, second = _load(tmp_path, pairs, read_only=True)
+    assert first.people is second.people
+    assert first.path != second.path
+    assert INTERNER.stats()["references"] == 2
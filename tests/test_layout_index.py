@@ -0,0 +1,91 @@
+import json
+import os
+import random
+
+import pytest
+
+from benchmarks.fleet import generate_tree, layout_document
+from mediapanel.config import LayoutConfig
+from mediapanel.config.layout_index import LayoutIndex, bit_indices
+
+
+@pytest.fixture
+def tree(tmp_path):
+    pairs = generate_tree(str(tmp_path), clients=2, devices=20, people=1,
+                          ads=1)
+    return tmp_path, pairs
+
+
+def _layout_path(base_path, client_id, device_id):
+    return LayoutConfig.v6_path(client_id, device_id, str(base_path))
+
+
+def _zones(index):
+    return [zone for zone, row in enumerate(index.zone_device) if row >= 0]
+
+
+def test_zones_where_matches_scan(tree):
+    base_path, pairs = tree
+    index = LayoutIndex.from_fleet(pairs, str(base_path))
+    rng = random.Random(1)
+    for _ in range(50):
+        min_area = rng.choice([0, 1, 270 * 1080, 480 * 1080, 1920 * 1080])
+        min_width = rng.choice([0, 270, 480, 481, 1080, 1920])
+        min_height = rng.choice([0, 1080, 1920])
+        expected = [zone for zone in _zones(index)
+                    if index.area[zone] >= min_area
+                    and index.x2[zone] - index.x1[zone] >= min_width
+                    and index.y2[zone] - index.y1[zone] >= min_height]
+        assert bit_indices(index.zones_where(min_area, min_width,
+                                             min_height)) == expected
+
+    assert index.zones_where(zones=0b1010) == 0b1010 & index.zones_where()
+
+
+def test_with_app_min_area(tree):
+    base_path, pairs = tree
+    index = LayoutIndex.from_fleet(pairs, str(base_path))
+    for app in index.apps():
+        expected = set()
+        for client_id, device_id in pairs:
+            layout = LayoutConfig.from_v6_id(client_id, device_id,
+                                             str(base_path))
+            if any(app in zone.apps and (zone.x2 - zone.x1)
+                   * (zone.y2 - zone.y1) >= 960 * 1080
+                   for zone in layout.zones):
+                expected.add((client_id, device_id))
+        rows = index.with_app(app, min_area=960 * 1080)
+        assert set(index.devices(rows)) == expected
+
+
+def test_refresh_and_remove(tree):
+    base_path, pairs = tree
+    index = LayoutIndex.from_fleet(pairs, str(base_path))
+    client_id, device_id = pairs[0]
+    path = _layout_path(base_path, client_id, device_id)
+
+    document = layout_document(random.Random(0))
+    document["SETTINGS"].update(VERTICAL=False, LAYOUT=1)
+    document["ZONES"] = [{"AREA": {"X1": 0, "Y1": 0, "X2": 1920, "Y2": 1080},
+                          "APPS": ["only-here"]}]
+    with open(path, "w") as f:
+        json.dump(document, f)
+    index.refresh(client_id, device_id)
+    assert index.devices(index.with_app("only-here")) == [pairs[0]]
+    assert index.devices(index.with_app("only-here",
+                                        min_width=1920)) == [pairs[0]]
+    assert pairs[0] not in index.devices(index.where(vertical=True))
+    zones = len(_zones(index))
+
+    index.remove(client_id, device_id)
+    assert pairs[0] not in index
+    assert index.with_app("only-here") == 0
+    assert index.with_app("only-here", min_area=1) == 0
+    assert len(_zones(index)) == zones - 1
+    assert bit_indices(index.zones_where()) == _zones(index)
+
+    index.refresh(client_id, device_id)
+    assert index.devices(index.with_app("only-here")) == [pairs[0]]
+    os.remove(path)
+    index.refresh(client_id, device_id)
+    assert pairs[0] not in index
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from benchmarks.fleet import ads_document
+from mediapanel.config import AdsConfig
+from mediapanel.config.ads import Ad
+from mediapanel.config.playlist import plan, replan
+
+ZONE = "America/New_York"
+Runtime = Ad.Timeframe.DaySchedule.Runtime
+
+
+@pytest.fixture
+def config():
+    return AdsConfig(AdsConfig.from_v6_values(ads_document(12, seed=5)))
+
+
+def _arrays(playlist):
+    return (list(playlist.starts), list(playlist.durations),
+            list(playlist.ads), list(playlist.media))
+
+
+@pytest.mark.parametrize("start, hours", [(date(2026, 3, 8), 23),
+                                          (date(2026, 11, 1), 25),
+                                          (date(2026, 6, 1), 24)])
+def test_plan_covers_local_day(config, start, hours):
+    playlist = plan(config, ZONE, start)
+    assert playlist.segments[0].start == 0
+    assert playlist.segments[-1].end == hours * 3600
+    for previous, segment in zip(playlist.segments, playlist.segments[1:]):
+        assert previous.end == segment.start
+    for segment in playlist.segments:
+        span = slice(segment.first, segment.first + segment.count)
+        starts, durations = playlist.starts[span], playlist.durations[span]
+        if segment.count:
+            assert starts[0] == segment.start
+            assert starts[-1] + durations[-1] == segment.end
+        assert all(a + d == b for a, d, b in zip(starts, durations,
+                                                 starts[1:]))
+
+
+def test_at_across_dst(config):
+    playlist = plan(config, ZONE, date(2026, 3, 8))
+    zone = ZoneInfo(ZONE)
+    for entry, (start, duration, ad, media) in enumerate(playlist.entries()):
+        if entry % 50 == 0:
+            assert playlist.at(start) == entry
+            assert playlist.at(start + timedelta(seconds=duration - 1)) \
+                == entry
+            assert start.tzinfo is zone
+    assert playlist.at(datetime(2026, 3, 9, 0, 0, tzinfo=zone)) == -1
+
+
+@pytest.mark.parametrize("start", [date(2026, 3, 7), date(2026, 10, 31)])
+def test_replan_matches_plan(config, start):
+    playlist = plan(config, ZONE, start, days=3)
+    for ad_index in (0, 5, 11):
+        ad = config.ads[ad_index]
+        for day_schedule in ad.timeframe.schedule:
+            day_schedule.runtimes = [Runtime((1, 15), (3, 0)),
+                                     Runtime((22, 0), (2, 30))]
+        ad.timeframe.end_day = datetime(start.year, start.month,
+                                        start.day) + timedelta(days=1)
+        playlist = replan(playlist, config, ad_index)
+        expected = plan(config, ZONE, start, days=3)
+        assert _arrays(playlist) == _arrays(expected)
+        assert playlist.segments == expected.segments
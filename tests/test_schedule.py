@@ -0,0 +1,106 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.fleet import ads_document
+from mediapanel.config import AdsConfig
+from mediapanel.config.ads import Ad
+from mediapanel.config.schedule import (MINUTES_PER_DAY, AdSchedule,
+                                        compile_timeframe, minute_of_week)
+
+DaySchedule = Ad.Timeframe.DaySchedule
+Weekday = DaySchedule.Weekday
+Runtime = DaySchedule.Runtime
+
+
+class Scheduled:
+    def __init__(self, timeframe):
+        self.timeframe = timeframe
+
+
+def _timeframe(runtimes, start=datetime(2026, 1, 1),
+               end=datetime(2026, 12, 31)):
+    return Ad.Timeframe(start, end, [
+        DaySchedule(Weekday[day], [Runtime(*runtime) for runtime in times])
+        for day, times in runtimes.items()])
+
+
+def _plays(timeframe, when: datetime) -> bool:
+    """
+    Whether an ad with timeframe plays at when, straight from its runtimes.
+    """
+    if not timeframe.start_day.toordinal() <= when.toordinal() \
+            <= timeframe.end_day.toordinal():
+        return False
+    minute = when.hour * 60 + when.minute
+    weekday = when.isoweekday() % 7 + 1
+    for day in timeframe.schedule:
+        for runtime in day.runtimes:
+            start = runtime.start[0] * 60 + runtime.start[1]
+            end = runtime.end[0] * 60 + runtime.end[1]
+            if day.weekday.value == weekday and (
+                    start <= minute < end or end <= start <= minute):
+                return True
+            if day.weekday.value % 7 + 1 == weekday and end <= start \
+                    and minute < end:
+                return True
+    return False
+
+
+@pytest.fixture
+def timeframes():
+    ads = AdsConfig(AdsConfig.from_v6_values(ads_document(30, seed=3))).ads
+    return [ad.timeframe for ad in ads] + [
+        _timeframe({"FRIDAY": [((22, 0), (2, 0))]}),
+        _timeframe({"SATURDAY": [((23, 0), (1, 30))],
+                    "SUNDAY": [((12, 0), (12, 0))]}),
+        _timeframe({"MONDAY": [((9, 0), (10, 30))]},
+                   start=datetime(2026, 3, 2), end=datetime(2026, 3, 9))]
+
+
+def test_compile_timeframe():
+    monday = datetime(2026, 3, 2)
+    mask = compile_timeframe(_timeframe({"MONDAY": [((9, 0), (10, 30))]}))
+    start = minute_of_week(monday.replace(hour=9))
+    assert mask == ((1 << 90) - 1) << start
+
+    # Saturday night runs into Sunday morning, at the start of the week
+    mask = compile_timeframe(_timeframe({"SATURDAY": [((23, 0), (1, 0))]}))
+    assert mask & ((1 << 60) - 1) == (1 << 60) - 1
+    assert mask >> (7 * MINUTES_PER_DAY - 60) == (1 << 60) - 1
+    assert bin(mask).count("1") == 120
+
+
+def test_active_at_matches_runtimes(timeframes):
+    schedule = AdSchedule.from_ads([Scheduled(t) for t in timeframes])
+    assert schedule.boundaries[0] == 0
+    rng = random.Random(0)
+    start = datetime(2025, 12, 28)
+    for _ in range(2000):
+        when = start + timedelta(minutes=rng.randrange(375 * MINUTES_PER_DAY))
+        expected = [i for i, timeframe in enumerate(timeframes)
+                    if _plays(timeframe, when)]
+        assert schedule.active_at(when) == expected, when
+
+
+def test_next_change_and_active_between(timeframes):
+    schedule = AdSchedule.from_ads([Scheduled(t) for t in timeframes])
+    when = datetime(2026, 3, 6, 20, 17)
+    change = schedule.next_change(when)
+    current = schedule.active_at(when)
+    minute = when.replace(second=0) + timedelta(minutes=1)
+    while minute < change:
+        assert schedule.active_at(minute) == current
+        minute += timedelta(minutes=1)
+    assert schedule.active_at(change) != current
+
+    end = when + timedelta(hours=30)
+    seen = set()
+    minute = when
+    while minute < end:
+        seen.update(schedule.active_at(minute))
+        minute += timedelta(minutes=1)
+    assert schedule.active_between(when, end) == sorted(seen)
+
+    assert schedule.next_change(datetime(2027, 1, 1)) is None